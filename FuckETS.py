@@ -1,44 +1,1750 @@
 import os
+import bisect
 import json
 import re
+import html
+import hashlib
+import heapq
+import math
+import mmap
+import struct
 import sys
 import platform
+import threading
+import time
+import zlib
+import contextlib
+import importlib.util
+from collections import OrderedDict, deque
+from array import array
+from itertools import accumulate, chain, islice, repeat
 from pathlib import Path
 
 # 检查系统
 is_win = platform.system() == 'Windows'
 
-# 库的导入情况
-PYQT_AVAILABLE = False
-# tk的文件对话框
-tk_fd = None
-if is_win:
-    try:
-        import tkinter as tk
-        from tkinter import filedialog as tk_fd
-        # 隐藏tk主窗口
-        root = tk.Tk()
-        root.withdraw()
-        # 试下PyQt5
+# 图形界面库按需导入：tkinter 只在弹出目录选择框时导入，PyQt5 只在选择 GUI 模式后导入，
+# 控制台模式不用为两个界面库付出启动时间。这里只检查 PyQt5 是否安装，不真正导入
+PYQT_AVAILABLE = is_win and importlib.util.find_spec('PyQt5') is not None
+
+# 解析缓存格式版本，记录结构变化时要加一
+CACHE_VERSION = 4
+
+# 运行统计：超过这个毫秒数的查询记为慢查询，慢查询日志和延迟窗口的长度
+SLOW_QUERY_MS = 50
+SLOW_QUERY_LOG_SIZE = 20
+QUERY_LATENCY_WINDOW = 1000
+# --profile 结束时打印的函数条数
+PROFILE_TOP_N = 25
+
+# 查询结果缓存保留的最近查询条数
+QUERY_CACHE_SIZE = 128
+
+# --verify-assets 最多列出的问题条数
+VERIFY_ASSETS_SHOWN = 50
+
+# 监视模式默认的检查间隔（秒）
+WATCH_INTERVAL = 5.0
+
+# 守护进程只监听本机，默认端口和单次查询最多返回的条数
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 8765
+DAEMON_RESULT_LIMIT = 200
+
+# 电脑版题库目录必须同时包含的文件
+PC_TEMPLATE_FILES = frozenset({'ctrl.json', 'info.json', 'res.json'})
+
+class 路径表:
+    # 目录和素材路径只存一份，记录里只保存下标
+    def __init__(self):
+        self.paths = ['']
+        self._ids = {'': 0}
+
+    def add(self, path):
+        idx = self._ids.get(path)
+        if idx is None:
+            idx = len(self.paths)
+            self.paths.append(path)
+            self._ids[path] = idx
+        return idx
+
+# 所有记录共用的路径表
+PATHS = 路径表()
+
+def _紧凑值(value):
+    # 列表转成元组，短字符串驻留，重复的答案、编号只存一份
+    if isinstance(value, list):
+        return tuple(_紧凑值(v) for v in value)
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= 32 else value
+    return value if value is not None else ''
+
+def _规范化(value):
+    # 去重用：忽略大小写和空白差异
+    if isinstance(value, str):
+        return ' '.join(value.casefold().split())
+    if isinstance(value, tuple):
+        return tuple(_规范化(v) for v in value)
+    return value
+
+class 题目记录:
+    # 题目记录的基类，用 __slots__ 代替字典省内存
+    # 保留 item['key'] / item.get() 的读取方式，打印和格式化代码不用改
+    # 内容相同的题目只存一份，_sources 记录它出现过的 (目录, 音频) 路径编号，第一个是主来源
+    __slots__ = ('id', '_sources')
+    type = ''
+    # 直接存成属性的字段
+    FIELDS = ()
+    # 按原来字典的键顺序排列，to_dict 和 keys 用
+    KEYS = ()
+    # 参与去重指纹的字段，默认就是 FIELDS（题号不算）
+    CONTENT_FIELDS = None
+
+    def __init__(self, data):
+        self.id = _紧凑值(data.get('id', ''))
+        for field in self.FIELDS:
+            setattr(self, field, _紧凑值(data.get(field, '')))
+        self._sources = [self._source(data)]
+
+    @staticmethod
+    def _source(data):
+        # 一个来源的路径编号：(目录, 音频)
+        return PATHS.add(data.get('directory', '')), PATHS.add(data.get('audio', ''))
+
+    @property
+    def directory(self):
+        return PATHS.paths[self._sources[0][0]]
+
+    @property
+    def audio(self):
+        return PATHS.paths[self._sources[0][1]]
+
+    @property
+    def sources(self):
+        # 所有来源的 [(目录, 音频)]
+        return [(PATHS.paths[source[0]], PATHS.paths[source[1]]) for source in self._sources]
+
+    @property
+    def source_count(self):
+        return len(self._sources)
+
+    def fingerprint(self):
+        # 按题型和规范化后的内容算哈希，大小写、空白不同也算同一题
+        values = tuple(_规范化(getattr(self, field)) for field in (self.CONTENT_FIELDS or self.FIELDS))
+        return hashlib.blake2b(repr((self.type, values)).encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key, default=None):
+        if key in self.KEYS:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def keys(self):
+        return self.KEYS
+
+    def values(self):
+        return [getattr(self, key) for key in self.KEYS]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.KEYS]
+
+    def to_dict(self):
+        # 转回普通字典，列表字段还原成 list
+        data = {}
+        for key in self.KEYS:
+            value = getattr(self, key)
+            data[key] = list(value) if isinstance(value, tuple) else value
+        return data
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class 选择题记录(题目记录):
+    __slots__ = ('dialogue', 'question', 'options', 'answer', 'analyze')
+    type = 'choose'
+    FIELDS = __slots__
+    KEYS = ('type', 'id', 'dialogue', 'question', 'options', 'answer', 'analyze', 'audio', 'directory')
+
+class 对话题记录(题目记录):
+    __slots__ = ('question', 'listening_text', 'standard_answers', 'keywords')
+    type = 'dialogue'
+    FIELDS = __slots__
+    KEYS = ('type', 'id', 'question', 'listening_text', 'standard_answers', 'keywords', 'audio', 'directory')
+
+class 阅读题记录(题目记录):
+    __slots__ = ('content', 'analyze')
+    type = 'read'
+    FIELDS = __slots__
+    KEYS = ('type', 'id', 'content', 'analyze', 'audio', 'directory')
+
+class 填空题记录(题目记录):
+    __slots__ = ('content', 'keypoint', '_answers')
+    type = 'fill'
+    FIELDS = ('content', 'keypoint')
+    KEYS = ('type', 'id', 'content', 'answers', 'keypoint', 'audio', 'directory')
+    CONTENT_FIELDS = ('content', 'keypoint', '_answers')
+
+    def __init__(self, data):
+        super().__init__(data)
+        # 答案存成 (题号, 答案) 元组
+        self._answers = tuple((_紧凑值(ans.get('number', '')), _紧凑值(ans.get('value', '')))
+                              for ans in data.get('answers', []) if isinstance(ans, dict))
+
+    @property
+    def answers(self):
+        return [{'number': number, 'value': value} for number, value in self._answers]
+
+class 图片题记录(题目记录):
+    __slots__ = ('content', 'topic', 'keypoint', 'analyze')
+    type = 'picture'
+    FIELDS = __slots__
+    KEYS = ('type', 'id', 'content', 'topic', 'keypoint', 'analyze', 'image', 'audio', 'directory')
+
+    @staticmethod
+    def _source(data):
+        # 图片跟着试卷目录走，也算来源的一部分：(目录, 音频, 图片)
+        return 题目记录._source(data) + (PATHS.add(data.get('image', '')),)
+
+    @property
+    def image(self):
+        return PATHS.paths[self._sources[0][2]]
+
+def _来源数(item):
+    # 记录上存的来源数；守护进程客户端拿到的是字典，按 sources 列表算
+    if isinstance(item, 题目记录):
+        return item.source_count
+    return len(item.get('sources') or ()) or 1
+
+RECORD_TYPES = {cls.type: cls for cls in (选择题记录, 对话题记录, 阅读题记录, 填空题记录, 图片题记录)}
+
+class _电脑版记录:
+    # 电脑版题库的记录只有题型名称（"模仿朗读"、"回答问题 问题 1"），每份试卷都一样
+    # 指纹带上题号和音频，不同试卷的题目不会被当成同一题合并
+    __slots__ = ()
+    template = 'pc'
+
+    def fingerprint(self):
+        values = tuple(_规范化(getattr(self, field)) for field in (self.CONTENT_FIELDS or self.FIELDS))
+        key = (self.type, self.template, self.id, self.audio, values)
+        return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+
+# 解析结果里带 'template': 'pc' 的记录用这些类型，to_dict 时保留这个标记
+PC_RECORD_TYPES = {name: type(cls.__name__, (_电脑版记录, cls), {'__slots__': (), 'KEYS': cls.KEYS + ('template',)})
+                   for name, cls in RECORD_TYPES.items()}
+
+def 生成记录(data):
+    # 解析得到的字典 -> 紧凑记录
+    types = PC_RECORD_TYPES if data.get('template') == 'pc' else RECORD_TYPES
+    return types[data['type']](data)
+
+# _clean_html 用的正则，一次匹配换行标签、其它标签、占位符和实体
+# 换行标签要排在普通标签前面
+_HTML_TOKEN = re.compile(
+    r'(?i:(<\s*/?\s*br\b[^>]*>))'
+    r'|<[^>]+>'
+    r'|ets_th\d+'
+    r'|(&(?:#\d+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);)'
+)
+# 常见实体直接查表，其它的（包括数字实体）交给 html.unescape
+_COMMON_ENTITIES = {
+    '&nbsp;': ' ',
+    '&amp;': '&',
+    '&quot;': '"',
+    '&lt;': '<',
+    '&gt;': '>',
+    '&#39;': "'",
+}
+
+def _替换HTML片段(m):
+    group = m.lastindex
+    if group is None:
+        # 普通标签和 ets_th 占位符直接去掉
+        return ''
+    if group == 1:
+        return '\x00'
+    entity = m.group(2)
+    value = _COMMON_ENTITIES.get(entity)
+    return value if value is not None else html.unescape(entity)
+
+# 倒排索引用的字符片段长度
+GRAM_SIZE = 3
+# 分词：连续的字母、数字、汉字算一个词
+_词 = re.compile(r'\w+')
+
+# 检索文本里分隔字段用的字符，输入里不会出现，避免跨字段匹配
+FIELD_SEP = '\x1f'
+
+# 二进制索引文件（--export-index / --index）：文件头 + 若干定长数组段，用 mmap 打开后直接查询
+# 同样的格式也用作启动索引：存在解析缓存旁边，不含题目本身，热启动时直接读回倒排表和相似题签名
+INDEX_MAGIC = b'FETSIDX\0'
+INDEX_FORMAT_VERSION = 2
+# 文件头里按这个顺序存各段的 (偏移, 字节数)
+INDEX_SECTIONS = (
+    'meta',
+    'record_offsets', 'records',
+    'text_offsets', 'texts', 'doc_len',
+    'gram_key_offsets', 'gram_keys', 'gram_offsets', 'gram_postings',
+    'token_key_offsets', 'token_keys', 'token_offsets', 'token_postings', 'token_tf',
+    'similar_signatures', 'band_keys', 'band_offsets', 'band_postings',
+)
+_INDEX_HEADER = struct.Struct('<8sII' + 'QQ' * len(INDEX_SECTIONS))
+
+def _字符串表(strings):
+    # 每项后面跟一个 FIELD_SEP，另存一个起始偏移数组（多一项表示结尾）
+    offsets = array('Q', [0])
+    chunks = []
+    pos = 0
+    for text in strings:
+        data = text.encode('utf-8') + FIELD_SEP.encode()
+        chunks.append(data)
+        pos += len(data)
+        offsets.append(pos)
+    return offsets, b''.join(chunks)
+
+def _倒排段(table, weights=None):
+    # 倒排表：键按 UTF-8 字节序排好（和码位顺序一致），编号连续存放，再存每个键的起止位置
+    keys = sorted(table)
+    key_offsets, key_blob = _字符串表(keys)
+    values = list(map(table.__getitem__, keys))
+    offsets = array('Q', [0])
+    offsets.extend(accumulate(map(len, values)))
+    postings = array('I', chain.from_iterable(values))
+    tf = array('f', chain.from_iterable(map(weights.__getitem__, keys)) if weights is not None else ())
+    return key_offsets, key_blob, offsets, postings, tf
+
+def _索引分段(buf, path):
+    # 检查文件头，返回 ({段名: (偏移, 字节数)}, meta)
+    if len(buf) < _INDEX_HEADER.size:
+        raise ValueError(f"索引文件太短: {path}")
+    header = _INDEX_HEADER.unpack_from(buf)
+    magic, version = header[:2]
+    if magic != INDEX_MAGIC or version != INDEX_FORMAT_VERSION:
+        raise ValueError(f"不是可用的索引文件（格式版本 {version}，需要 {INDEX_FORMAT_VERSION}）: {path}")
+    sections = {name: (header[3 + 2 * i], header[4 + 2 * i]) for i, name in enumerate(INDEX_SECTIONS)}
+    offset, size = sections['meta']
+    meta = json.loads(bytes(buf[offset:offset + size]).decode('utf-8'))
+    if meta.get('byteorder') != sys.byteorder:
+        raise ValueError(f"索引文件的字节序（{meta.get('byteorder')}）和本机不同，请在本机重新导出")
+    return sections, meta
+
+# 去掉字符串表每项结尾的 FIELD_SEP
+_去掉分隔符 = slice(None, -1)
+
+def _切片(data, offsets):
+    # 按相邻的偏移把 data 切成一段段，循环都在 C 里
+    return map(data.__getitem__, map(slice, offsets, offsets[1:]))
+
+def _读字符串表(raw, prefix):
+    # _字符串表 写出的段 -> 字符串列表
+    return list(map(str.__getitem__, map(bytes.decode, _切片(raw(f'{prefix}s'), array('Q', raw(f'{prefix}_offsets')))),
+                    repeat(_去掉分隔符)))
+
+def _读倒排表(raw, prefix, typecode='I', values=None):
+    # 把 _倒排段 写出的一组段读回 {键: 数组}：整段读成一个数组再按键切开，不逐条记录处理
+    keys = _读字符串表(raw, f'{prefix}_key')
+    offsets = array('Q', raw(f'{prefix}_offsets'))
+    return dict(zip(keys, _切片(array(typecode, raw(values or f'{prefix}_postings')), offsets)))
+
+# 排序搜索的字段权重，没列出的按 1.0
+FIELD_WEIGHTS = {
+    'question': 3.0,
+    'standard_answers': 3.0,
+    'answers': 2.5,
+    'keywords': 2.0,
+    'topic': 2.0,
+    'options': 1.5,
+    'keypoint': 1.5,
+    'analyze': 0.5,
+}
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 片段相似度在总分里的权重
+TRIGRAM_WEIGHT = 2.0
+# 出现在超过这个比例记录里的片段不参与相似度
+COMMON_GRAM_RATIO = 0.5
+# 拼写容错：相似度下限和每个词最多扩展几个近似词
+FUZZY_MIN_SIMILARITY = 0.35
+FUZZY_EXPANSIONS = 3
+# 排序搜索默认返回的条数
+RANKED_TOP_K = 20
+# 命令行每页显示的结果条数，多出来的按回车继续显示
+CONSOLE_PAGE_SIZE = 20
+
+# 各题型参与搜索的字段，列表字段会展开（填空答案取 value）
+SEARCH_FIELDS = {
+    'choose': ('question', 'dialogue', 'analyze', 'options', 'answer'),
+    'dialogue': ('question', 'listening_text', 'standard_answers', 'keywords'),
+    'read': ('content', 'analyze'),
+    'fill': ('content', 'keypoint', 'answers'),
+    'picture': ('topic', 'content', 'keypoint', 'analyze'),
+}
+
+def _片段(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+class 搜索索引:
+    # 倒排索引：把词和字符片段映射到记录编号（records 里的下标）
+    # 查询时先用它缩小候选范围，再逐条确认
+    # 支持增删：新记录追加在末尾，删除的记录只留空位，空位太多时整体重建
+    @classmethod
+    def 载入(cls, raw, meta, records, fields_of):
+        # 从 save 写出的启动索引读回可增删的索引，records 要和保存时的顺序一致
+        # raw(段名) 返回该段的字节；只按键切分倒排表，不重新分词
+        if meta['records'] != len(records):
+            raise ValueError("启动索引和题库的题目数不一致")
+        obj = cls.__new__(cls)
+        obj.fields_of = fields_of
+        obj.records = list(records)
+        obj.texts = _读字符串表(raw, 'text')
+        obj.doc_len = array('f', raw('doc_len'))
+        obj._total_len = meta['total_len']
+        obj.grams = _读倒排表(raw, 'gram')
+        obj.tokens = _读倒排表(raw, 'token')
+        obj.token_tf = _读倒排表(raw, 'token', 'f', 'token_tf')
+        obj._rids = dict(zip(obj.records, range(len(obj.records))))
+        obj.dead = 0
+        obj._vocab_grams = None
+        return obj
+
+    def __init__(self, records, fields_of):
+        self.fields_of = fields_of
+        self.records = []
+        # 每条记录预先算好的检索文本，和 records 一一对应
+        self.texts = []
+        # 按字段权重累加的文档长度，排序搜索用
+        self.doc_len = array('f')
+        self._total_len = 0.0
+        # 编号按顺序追加，倒排表天然有序，直接用紧凑数组
+        self.grams = {}
+        self.tokens = {}
+        # 和 tokens 对应的按字段加权的词频
+        self.token_tf = {}
+        # 记录 -> 编号，删除时用
+        self._rids = {}
+        # 已删除的空位数量
+        self.dead = 0
+        # 词表的片段索引，第一次模糊查询时才建
+        self._vocab_grams = None
+        self.add(records)
+
+    @property
+    def live_count(self):
+        return len(self.records) - self.dead
+
+    @property
+    def avg_len(self):
+        return self._total_len / self.live_count if self.live_count else 0.0
+
+    def add(self, items):
+        # 追加记录并更新倒排表
+        grams = self.grams
+        tokens = self.tokens
+        token_tf = self.token_tf
+        new_token = False
+        for item in items:
+            rid = len(self.records)
+            self.records.append(item)
+            self._rids[item] = rid
+            parts = [(field, text.casefold()) for field, text in self.fields_of(item)]
+            text = FIELD_SEP.join(part for _, part in parts)
+            self.texts.append(text)
+            for g in _片段(text):
+                ids = grams.get(g)
+                if ids is None:
+                    grams[g] = array('I', (rid,))
+                else:
+                    ids.append(rid)
+            tf = {}
+            length = 0.0
+            for field, part in parts:
+                weight = FIELD_WEIGHTS.get(field, 1.0)
+                for t in _词.findall(part):
+                    tf[t] = tf.get(t, 0.0) + weight
+                    length += weight
+            self.doc_len.append(length)
+            self._total_len += length
+            for t, freq in tf.items():
+                ids = tokens.get(t)
+                if ids is None:
+                    tokens[t] = array('I', (rid,))
+                    token_tf[t] = array('f', (freq,))
+                    new_token = True
+                else:
+                    ids.append(rid)
+                    token_tf[t].append(freq)
+        if new_token:
+            self._vocab_grams = None
+
+    def remove(self, items):
+        # 删除记录：只清空位置，倒排表里的旧编号在查询时被过滤掉
+        for item in items:
+            rid = self._rids.pop(item, None)
+            if rid is None:
+                continue
+            self.records[rid] = None
+            self.texts[rid] = ''
+            self._total_len -= self.doc_len[rid]
+            self.doc_len[rid] = 0.0
+            self.dead += 1
+
+    def candidates(self, k):
+        # 返回可能包含 k 的记录编号（升序），None 表示无法缩小范围
+        if len(k) >= GRAM_SIZE:
+            # 子串的每个片段都必须出现，取各片段倒排表的交集
+            lists = []
+            for g in _片段(k):
+                ids = self.grams.get(g)
+                if ids is None:
+                    return []
+                lists.append(ids)
+            lists.sort(key=len)
+            result = set(lists[0])
+            for ids in lists[1:]:
+                result.intersection_update(ids)
+                if not result:
+                    break
+            return sorted(result)
+        if _词.fullmatch(k):
+            # 短词一定落在某个完整的词里面，扫词表就够了
+            result = set()
+            for token, ids in self.tokens.items():
+                if k in token:
+                    result.update(ids)
+            return sorted(result)
+        return None
+
+    # --------------------------排序搜索
+
+    def _similar_terms(self, term):
+        # 找词表里和 term 片段相似度足够高的词，用来容错拼写
+        if self._vocab_grams is None:
+            vocab_grams = {}
+            for t in self.tokens:
+                for g in _片段(f"^{t}$"):
+                    vocab_grams.setdefault(g, []).append(t)
+            self._vocab_grams = vocab_grams
+        grams = _片段(f"^{term}$")
+        if not grams:
+            return []
+        overlap = {}
+        for g in grams:
+            for t in self._vocab_grams.get(g, ()):
+                overlap[t] = overlap.get(t, 0) + 1
+        similar = []
+        for t, shared in overlap.items():
+            sim = shared / (len(grams) + len(_片段(f"^{t}$")) - shared)
+            if sim >= FUZZY_MIN_SIMILARITY:
+                similar.append((sim, t))
+        return heapq.nlargest(FUZZY_EXPANSIONS, similar)
+
+    def rank(self, query, k):
+        # BM25（按字段加权的词频）加上片段相似度打分，返回得分最高的 k 条 [(得分, 编号)]
+        query = query.casefold()
+        n = self.live_count
+        if not n:
+            return []
+        scores = {}
+        k1, b = BM25_K1, BM25_B
+        avg_len = self.avg_len or 1.0
+        doc_len = self.doc_len
+        for term in set(_词.findall(query)):
+            if term in self.tokens:
+                expansions = [(1.0, term)]
+            else:
+                # 词表里没有这个词，按拼写相近的词来算
+                expansions = self._similar_terms(term)
+            for weight, t in expansions:
+                ids = self.tokens[t]
+                freqs = self.token_tf[t]
+                df = len(ids)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5)) * weight
+                for rid, tf in zip(ids, freqs):
+                    norm = tf + k1 * (1 - b + b * doc_len[rid] / avg_len)
+                    scores[rid] = scores.get(rid, 0.0) + idf * tf * (k1 + 1) / norm
+        # 片段相似度：查询片段在记录里出现的比例（按 idf 加权），
+        # 太常见的片段不参与，中文等没有分词的文本也能靠它排序
+        weighted = []
+        total = 0.0
+        for g in _片段(query):
+            ids = self.grams.get(g, ())
+            if len(ids) > n * COMMON_GRAM_RATIO:
+                continue
+            w = math.log((n + 1) / (len(ids) + 1))
+            total += w
+            if ids:
+                weighted.append((w, ids))
+        for w, ids in weighted:
+            bonus = TRIGRAM_WEIGHT * w / total
+            for rid in ids:
+                scores[rid] = scores.get(rid, 0.0) + bonus
+        live = self._live
+        return heapq.nlargest(k, ((score, rid) for rid, score in scores.items() if live(rid)),
+                              key=lambda pair: (pair[0], -pair[1]))
+
+    def _live(self, rid):
+        return self.records[rid] is not None
+
+    # --------------------------二进制索引文件
+
+    def save(self, path, meta, similar, with_records=True):
+        # 写成 映射索引 能直接打开的二进制文件，调用前要保证没有空位；
+        # similar 是同样顺序的 相似索引，签名和分桶一起写进去；
+        # 启动索引不写题目（with_records=False），题目从解析缓存来
+        if with_records:
+            records = [json.dumps({'data': item.to_dict(),
+                                   'sources': [[PATHS.paths[i] for i in source] for source in item._sources]},
+                                  ensure_ascii=False)
+                       for item in self.records]
+        else:
+            records = ()
+            meta = dict(meta, startup=True)
+        meta = dict(meta, records=len(self.records), total_len=self._total_len, byteorder=sys.byteorder)
+        sections = {'meta': json.dumps(meta, ensure_ascii=False).encode('utf-8')}
+        sections['record_offsets'], sections['records'] = _字符串表(records)
+        sections['text_offsets'], sections['texts'] = _字符串表(self.texts)
+        sections['doc_len'] = self.doc_len
+        (sections['gram_key_offsets'], sections['gram_keys'], sections['gram_offsets'],
+         sections['gram_postings'], _) = _倒排段(self.grams)
+        (sections['token_key_offsets'], sections['token_keys'], sections['token_offsets'],
+         sections['token_postings'], sections['token_tf']) = _倒排段(self.tokens, self.token_tf)
+        sections.update(similar.sections())
+
+        tmp = Path(str(path) + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(b'\0' * _INDEX_HEADER.size)
+            table = []
+            for name in INDEX_SECTIONS:
+                # 每段按 8 字节对齐，mmap 后可以直接 cast 成数组
+                f.write(b'\0' * (-f.tell() % 8))
+                data = sections[name]
+                data = data.tobytes() if isinstance(data, array) else data
+                table += [f.tell(), len(data)]
+                f.write(data)
+            f.seek(0)
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION, len(self.records), *table))
+        os.replace(tmp, path)
+
+class _映射键表:
+    # mmap 里按字节序排好的键和对应的数组切片，用法和 {键: 数组} 一样
+    def __init__(self, mm, key_offsets, keys_start, offsets, values):
+        self._mm = mm
+        self._key_offsets = key_offsets
+        self._keys_start = keys_start
+        self._offsets = offsets
+        self._values = values
+        self._n = len(key_offsets) - 1
+
+    def _key(self, i):
+        start = self._keys_start
+        return self._mm[start + self._key_offsets[i]:start + self._key_offsets[i + 1] - 1]
+
+    def _find(self, key):
+        # 二分查找，返回下标，找不到返回 -1
+        data = key.encode('utf-8')
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < data:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._n and self._key(lo) == data else -1
+
+    def _value(self, i):
+        return self._values[self._offsets[i]:self._offsets[i + 1]]
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return self._value(i) if i >= 0 else default
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._value(i)
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __len__(self):
+        return self._n
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self._key(i).decode('utf-8')
+
+    def items(self):
+        for i in range(self._n):
+            yield self._key(i).decode('utf-8'), self._value(i)
+
+class _映射字符串:
+    # mmap 里的字符串表，按下标取时才解码
+    def __init__(self, mm, offsets, start):
+        self._mm = mm
+        self._offsets = offsets
+        self._start = start
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        start = self._start
+        return self._mm[start + self._offsets[i]:start + self._offsets[i + 1] - 1].decode('utf-8')
+
+class _映射记录(_映射字符串):
+    # 记录只在要打印或渲染时才解码，解码过的留着，同一条记录始终是同一个对象
+    def __init__(self, mm, offsets, start):
+        super().__init__(mm, offsets, start)
+        self._decoded = {}
+
+    def __getitem__(self, i):
+        item = self._decoded.get(i)
+        if item is None:
+            data = json.loads(super().__getitem__(i))
+            item = 生成记录(data['data'])
+            item._sources = [tuple(PATHS.add(path) for path in source) for source in data['sources']]
+            self._decoded[i] = item
+        return item
+
+class 映射索引(搜索索引):
+    # 用 mmap 打开 搜索索引.save 写出的文件，查询接口和 搜索索引 相同，
+    # 但不在内存里建任何记录或倒排表：倒排表是文件里的数组切片，记录按需解码
+    # 只读，不支持 add / remove
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        self._sections, self.meta = _索引分段(mm, path)
+        if self.meta.get('startup'):
+            raise ValueError(f"这是启动时自动生成的索引，不含题目，请用 --export-index 导出: {path}")
+
+        self.fields_of = None
+        self.records = _映射记录(mm, self._array('record_offsets', 'Q'), self._sections['records'][0])
+        self.texts = _映射字符串(mm, self._array('text_offsets', 'Q'), self._sections['texts'][0])
+        self.doc_len = self._array('doc_len', 'f')
+        self._total_len = self.meta['total_len']
+        self.grams = _映射键表(mm, self._array('gram_key_offsets', 'Q'), self._sections['gram_keys'][0],
+                               self._array('gram_offsets', 'Q'), self._array('gram_postings', 'I'))
+        token_keys = (mm, self._array('token_key_offsets', 'Q'), self._sections['token_keys'][0],
+                      self._array('token_offsets', 'Q'))
+        self.tokens = _映射键表(*token_keys, self._array('token_postings', 'I'))
+        self.token_tf = _映射键表(*token_keys, self._array('token_tf', 'f'))
+        self._rids = {}
+        self.dead = 0
+        self._vocab_grams = None
+
+    def _raw(self, name):
+        offset, size = self._sections[name]
+        return memoryview(self._mm)[offset:offset + size]
+
+    def _array(self, name, typecode):
+        return self._raw(name).cast(typecode)
+
+    def _live(self, rid):
+        return True
+
+    def add(self, items):
+        raise TypeError("二进制索引是只读的")
+
+    remove = add
+
+    def candidates(self, k):
+        if len(k) >= GRAM_SIZE or not k:
+            return super().candidates(k) if k else None
+        # 短查询直接在 mmap 的检索文本里找子串，再把位置换算成记录编号
+        data = k.encode('utf-8')
+        mm = self._mm
+        start, size = self._sections['texts']
+        end = start + size
+        offsets = self.texts._offsets
+        result = []
+        pos = mm.find(data, start, end)
+        while pos != -1:
+            rid = bisect.bisect_right(offsets, pos - start) - 1
+            result.append(rid)
+            pos = mm.find(data, start + offsets[rid + 1], end)
+        return result
+
+# --------------------------相似题（MinHash + LSH）
+# 用哪些字段的文字判断两道题是不是同一段对话 / 文章的改写
+SIMILAR_FIELDS = ('content', 'dialogue', 'listening_text')
+# 连续几个词算一个 shingle
+SHINGLE_SIZE = 3
+# MinHash 签名长度（2 的幂）和 LSH 分段数，每段 SIMILAR_NUM_PERM // SIMILAR_BANDS 个值；
+# 64 / 16 时相似度 0.5 左右的两题有一半概率落进同一个桶，0.7 以上基本都能找到
+SIMILAR_NUM_PERM = 64
+SIMILAR_BANDS = 16
+# 相似题默认返回的条数，以及低于这个估计相似度的不算相似
+SIMILAR_TOP_K = 10
+SIMILAR_MIN_SCORE = 0.15
+# GUI 里以这个字符开头时按相似度查找后面的文字
+SIMILAR_PREFIX = '~'
+
+# 签名里没有分到任何 shingle 的位置
+_SIMILAR_EMPTY = (1 << 64) - 1
+_空签名 = array('Q', [_SIMILAR_EMPTY] * SIMILAR_NUM_PERM)
+
+def 相似文本(item):
+    return '\n'.join(value for value in (item.get(field) for field in SIMILAR_FIELDS) if isinstance(value, str))
+
+def 相似特征(text):
+    # 文字 -> shingle 集合：折叠大小写后切词，取连续 SHINGLE_SIZE 个词；词太少时整段算一个
+    words = _词.findall(text.casefold())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def MinHash签名(shingles):
+    # 单次哈希的 MinHash（one permutation hashing）：每个 shingle 只算一次哈希
+    # （crc32 乘一个 64 位奇数取中间的位），低位决定分到哪个位置，每个位置取最小值。
+    # 文字短时有些位置是空的，记成 _SIMILAR_EMPTY，比较时不算
+    if not shingles:
+        return None
+    n = SIMILAR_NUM_PERM
+    # 从大到小写进字典，同一位置最后留下的是最小值
+    mins = {z & (n - 1): z for z in sorted([(zlib.crc32(shingle.encode('utf-8')) * 0x9E3779B97F4A7C15) >> 32
+                                               for shingle in shingles], reverse=True)}
+    signature = array('Q', _空签名)
+    for slot, z in mins.items():
+        signature[slot] = z
+    return signature
+
+def _相似度(a, b):
+    # 两个签名都有值且相等的位置占比，两边都空的位置不算：Jaccard 相似度的估计
+    same = empty = 0
+    for x, y in zip(a, b):
+        if x == y:
+            if x == _SIMILAR_EMPTY:
+                empty += 1
+            else:
+                same += 1
+    return same / (SIMILAR_NUM_PERM - empty) if empty < SIMILAR_NUM_PERM else 0.0
+
+class 相似索引:
+    # 每条记录一个 MinHash 签名，LSH 把签名切成 SIMILAR_BANDS 段，每段一个 {段哈希: [记录编号]} 表；
+    # 查询只看至少一段完全相同的记录，不和整个题库逐条比较。编号和删除方式同 搜索索引
+    # 写进索引文件的分桶键：1 字节段号 + 段签名
+    KEY_SIZE = 1 + SIMILAR_NUM_PERM * 8 // SIMILAR_BANDS
+
+    def __init__(self, records):
+        self.records = []
+        # 所有签名连续存在一个数组里，第 rid 条占 SIMILAR_NUM_PERM 个值，没有签名的全空
+        self.signatures = array('Q')
+        self._rids = {}
+        self._bands = [{} for _ in range(SIMILAR_BANDS)]
+        # 从启动索引读回时分桶先保留原始的段，第一次用到时才展开
+        self._band_sections = None
+        self.dead = 0
+        self.add(records)
+
+    @classmethod
+    def 载入(cls, raw, records):
+        # 从 搜索索引.save 写出的段读回签名和分桶，records 要和保存时的顺序一致
+        signatures = array('Q', raw('similar_signatures'))
+        if len(signatures) != SIMILAR_NUM_PERM * len(records):
+            raise ValueError("启动索引里的相似题签名和题目数不一致")
+        obj = cls.__new__(cls)
+        obj.records = list(records)
+        obj._rids = dict(zip(obj.records, range(len(obj.records))))
+        obj.signatures = signatures
+        obj._bands = None
+        obj._band_sections = (raw('band_keys'), raw('band_offsets'), raw('band_postings'))
+        obj.dead = 0
+        return obj
+
+    @property
+    def bands(self):
+        if self._bands is None:
+            # 分桶键是 1 字节段号加段签名，按字节序排好，同一段的键是连续的一块
+            keys, offsets, postings = self._band_sections
+            postings = _切片(array('I', postings), array('Q', offsets))
+            key_size = self.KEY_SIZE
+            band_of = keys[::key_size]
+            bands = []
+            for n in range(SIMILAR_BANDS):
+                start, end = bisect.bisect_left(band_of, n), bisect.bisect_left(band_of, n + 1)
+                band_keys = map(keys.__getitem__, map(slice, range(start * key_size + 1, end * key_size, key_size),
+                                                      range((start + 1) * key_size, (end + 1) * key_size, key_size)))
+                bands.append(dict(zip(band_keys, islice(postings, end - start))))
+            self._bands = bands
+            self._band_sections = None
+        return self._bands
+
+    @staticmethod
+    def _band_keys(signature):
+        # 每段签名的字节串（直接当字典键），整段都空的段是 None，不参与分桶，否则短文字之间都会撞到一起
+        data = signature.tobytes()
+        size = len(data) // SIMILAR_BANDS
+        empty = b'\xff' * size
+        return [None if data[i:i + size] == empty else data[i:i + size] for i in range(0, len(data), size)]
+
+    def add(self, items):
+        # 同一段听力原文下的几道题文字相同，签名只算一次
+        known = {}
+        for item in items:
+            rid = len(self.records)
+            self.records.append(item)
+            self._rids[item] = rid
+            # 没有原文的题目（比如单独的选择题）不参与
+            text = 相似文本(item)
+            signature = known.get(text)
+            if signature is None and text not in known:
+                signature = known[text] = MinHash签名(相似特征(text))
+            self.signatures.extend(_空签名 if signature is None else signature)
+            if signature is not None:
+                for band, key in zip(self.bands, self._band_keys(signature)):
+                    if key is not None:
+                        band.setdefault(key, []).append(rid)
+
+    def remove(self, items):
+        for item in items:
+            rid = self._rids.pop(item, None)
+            if rid is None:
+                continue
+            signature = self._signature(rid)
+            if signature != _空签名:
+                for band, key in zip(self.bands, self._band_keys(signature)):
+                    if key is None:
+                        continue
+                    ids = band[key]
+                    ids.remove(rid)
+                    if not ids:
+                        del band[key]
+            self.records[rid] = None
+            self.signatures[rid * SIMILAR_NUM_PERM:(rid + 1) * SIMILAR_NUM_PERM] = _空签名
+            self.dead += 1
+
+    def _live(self, rid):
+        return self.records[rid] is not None
+
+    def _rid(self, item):
+        return self._rids.get(item)
+
+    def _bucket(self, band, key):
+        return self.bands[band].get(key)
+
+    def _signature(self, rid):
+        return self.signatures[rid * SIMILAR_NUM_PERM:(rid + 1) * SIMILAR_NUM_PERM]
+
+    def query(self, signature, k, exclude=None):
+        # 返回不低于 SIMILAR_MIN_SCORE 的 [(相似度, 编号)]，按相似度从高到低，相同时按语料顺序
+        # 只用编号比较，不取记录本身（映射相似索引 里取记录要解码）
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            ids = self._bucket(band, key) if key is not None else None
+            if ids:
+                candidates.update(ids)
+        skip = None if exclude is None else self._rid(exclude)
+        scored = []
+        for rid in candidates:
+            if rid == skip or not self._live(rid):
+                continue
+            score = _相似度(signature, self._signature(rid))
+            if score >= SIMILAR_MIN_SCORE:
+                scored.append((score, rid))
+        return heapq.nlargest(k, scored, key=lambda entry: (entry[0], -entry[1]))
+
+    def sections(self):
+        # 写进二进制索引的段：签名本来就连续存放；
+        # 分桶键是 1 字节段号加上这段签名的字节，长度固定，按字节序排好，编号连续存放
+        # 每段单独排序再按段号拼起来，拼接和求偏移都在 C 里做
+        keys = []
+        lengths = []
+        postings = array('I')
+        for band, table in enumerate(self.bands):
+            ordered = sorted(table)
+            ids = list(map(table.__getitem__, ordered))
+            keys += zip(repeat(bytes((band,))), ordered)
+            lengths += map(len, ids)
+            postings.extend(chain.from_iterable(ids))
+        offsets = array('Q', [0])
+        offsets.extend(accumulate(lengths))
+        return {'similar_signatures': self.signatures, 'band_keys': b''.join(chain.from_iterable(keys)),
+                'band_offsets': offsets, 'band_postings': postings}
+
+class 映射相似索引(相似索引):
+    # 用 映射索引 打开的文件里的相似题段，查询接口和 相似索引 相同：签名是文件里的数组切片，
+    # 分桶键二分查找，只有最后返回的记录才解码。只读，不支持 add / remove
+    def __init__(self, index):
+        self.records = index.records
+        self.signatures = index._array('similar_signatures', 'Q')
+        if len(self.signatures) != SIMILAR_NUM_PERM * len(self.records):
+            raise ValueError("索引文件里的相似题签名和题目数不一致")
+        self._mm = index._mm
+        self._keys_start, size = index._sections['band_keys']
+        self._n = size // self.KEY_SIZE
+        self._offsets = index._array('band_offsets', 'Q')
+        self._postings = index._array('band_postings', 'I')
+        self.dead = 0
+
+    def _live(self, rid):
+        return True
+
+    def _rid(self, item):
+        # 要排除的记录一定是解码过的
+        return next((rid for rid, decoded in self.records._decoded.items() if decoded is item), None)
+
+    def _bucket(self, band, key):
+        data = bytes((band,)) + key
+        size, start = self.KEY_SIZE, self._keys_start
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._mm[start + mid * size:start + (mid + 1) * size] < data:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._mm[start + lo * size:start + (lo + 1) * size] == data:
+            return self._postings[self._offsets[lo]:self._offsets[lo + 1]]
+        return None
+
+    def add(self, items):
+        raise TypeError("二进制索引是只读的")
+
+    remove = add
+
+# --------------------------SQLite 导出（--export-sqlite / --backend sqlite）
+# 表结构或去重指纹变化时要加一，打开旧版本的数据库会整个重建
+SQLITE_SCHEMA_VERSION = 2
+# FTS5 表的列：各题型参与搜索的字段，列表字段的多项用换行连接
+SQLITE_FTS_COLUMNS = tuple(dict.fromkeys(field for fields in SEARCH_FIELDS.values() for field in fields))
+
+class SQLite题库:
+    # 把题库写进 SQLite，别的工具可以直接查询，也可以代替内存扫描做搜索后端：
+    #   records  每条题目一行（去重后），data 是 JSON
+    #   sources  题目来自哪些源文件（目录、音频），一题多份试卷时有多行
+    #   units    每个源文件的签名，按源文件增量更新
+    #   search   搜索字段上的 FTS5 表（trigram 分词，支持任意子串），rowid 就是 records.id
+    def __init__(self, path, root):
+        import sqlite3
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
         try:
-            from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                                        QLineEdit, QPushButton, QTextEdit)
-            from PyQt5.QtCore import Qt, QPoint
-            from PyQt5.QtGui import QFont
-            PYQT_AVAILABLE = True
-        except ImportError:
-            pass
-    except ImportError:
-        pass
+            self._create(str(root))
+        except sqlite3.OperationalError as e:
+            self._conn.close()
+            raise RuntimeError(f"无法创建 SQLite 题库 {self.path}（需要带 FTS5 的 SQLite 3.34 以上）: {e}")
+        columns = ', '.join(SQLITE_FTS_COLUMNS)
+        self._insert_search = (f"INSERT INTO search (rowid, type, {columns}) "
+                               f"VALUES (?, ?, {', '.join('?' * len(SQLITE_FTS_COLUMNS))})")
+        # 少于 3 个字符 trigram 用不上，逐列 LIKE
+        self._like_search = "SELECT rowid FROM search WHERE " + ' OR '.join(
+            f"{column} LIKE ? ESCAPE '\\'" for column in SQLITE_FTS_COLUMNS)
+
+    def _create(self, root):
+        conn = self._conn
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        with conn:
+            if meta and (meta.get('schema') != str(SQLITE_SCHEMA_VERSION) or meta.get('root') != root):
+                # 格式变了或者换了题库目录，整个重建
+                for table in ('search', 'sources', 'records', 'units'):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DELETE FROM meta")
+            conn.execute("CREATE TABLE IF NOT EXISTS units (key TEXT PRIMARY KEY, sig TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS records "
+                         "(id INTEGER PRIMARY KEY, fingerprint BLOB UNIQUE, type TEXT, data TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sources (record_id INTEGER, unit TEXT, directory TEXT, audio TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sources_unit ON sources (unit)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sources_record ON sources (record_id)")
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS search "
+                         f"USING fts5(type UNINDEXED, {', '.join(SQLITE_FTS_COLUMNS)}, tokenize='trigram')")
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [('schema', str(SQLITE_SCHEMA_VERSION)), ('root', root)])
+
+    def sync(self, unit_sigs, unit_items, fields_of):
+        # 按源文件增量更新：签名没变的源文件不动，返回 (写入的源文件数, 删除的源文件数)
+        # 先删旧来源、再加新来源、最后删掉没有来源的题目，内容没变的题目保留原来的 id
+        with self._lock, self._conn as conn:
+            old = dict(conn.execute("SELECT key, sig FROM units"))
+            sigs = {key: json.dumps(sig) for key, sig in unit_sigs.items()}
+            removed = [key for key in old if key not in sigs]
+            # 没有签名的源文件每次都重写
+            changed = [key for key, sig in sigs.items() if unit_sigs[key] is None or old.get(key) != sig]
+            for key in removed + changed:
+                conn.execute("DELETE FROM sources WHERE unit = ?", (key,))
+                conn.execute("DELETE FROM units WHERE key = ?", (key,))
+            for key in changed:
+                for item, source in unit_items.get(key, ()):
+                    fingerprint = item.fingerprint()
+                    row = conn.execute("SELECT id FROM records WHERE fingerprint = ?", (fingerprint,)).fetchone()
+                    if row is None:
+                        rid = conn.execute("INSERT INTO records (fingerprint, type, data) VALUES (?, ?, ?)",
+                                           (fingerprint, item.type,
+                                            json.dumps(item.to_dict(), ensure_ascii=False))).lastrowid
+                        conn.execute(self._insert_search, (rid, item.type, *self._columns(item, fields_of)))
+                    else:
+                        rid = row[0]
+                    conn.execute("INSERT INTO sources (record_id, unit, directory, audio) VALUES (?, ?, ?, ?)",
+                                 (rid, key, PATHS.paths[source[0]], PATHS.paths[source[1]]))
+                conn.execute("INSERT INTO units (key, sig) VALUES (?, ?)", (key, sigs[key]))
+            orphans = "SELECT id FROM records WHERE id NOT IN (SELECT record_id FROM sources)"
+            conn.execute(f"DELETE FROM search WHERE rowid IN ({orphans})")
+            conn.execute(f"DELETE FROM records WHERE id IN ({orphans})")
+        return len(changed), len(removed)
+
+    @staticmethod
+    def _columns(item, fields_of):
+        values = {}
+        for field, text in fields_of(item):
+            values.setdefault(field, []).append(text)
+        return ['\n'.join(values[column]) if column in values else None for column in SQLITE_FTS_COLUMNS]
+
+    def fingerprints(self):
+        # [(records.id, 内容指纹)]，用来把查询结果换成内存里的记录
+        with self._lock:
+            return self._conn.execute("SELECT id, fingerprint FROM records").fetchall()
+
+    def search(self, k):
+        # 返回检索字段里包含 k 的 records.id，不区分大小写
+        with self._lock:
+            conn = self._conn
+            if not k:
+                rows = conn.execute("SELECT id FROM records")
+            elif len(k) >= GRAM_SIZE:
+                # 加引号当成短语，trigram 分词下就是子串匹配
+                rows = conn.execute("SELECT rowid FROM search WHERE search MATCH ?", ('"' + k.replace('"', '""') + '"',))
+            else:
+                pattern = '%' + re.sub(r'([\\%_])', r'\\\1', k) + '%'
+                rows = conn.execute(self._like_search, (pattern,) * len(SQLITE_FTS_COLUMNS))
+            return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --------------------------查询语言
+# 以 "?" 开头的输入按查询语言解析，例如：
+#   ?weekend library              两个词都要出现（AND 可以省略）
+#   ?holiday OR birthday -ticket  任一个出现，且不含 ticket（-词 等于 NOT 词）
+#   ?"good morning" type:choose   短语，只看选择题
+#   ?answer:library /week(end)?/  答案字段里有 library，且检索文本匹配正则
+# 其它输入保持原来的整串子串匹配
+QUERY_PREFIX = '?'
+
+# 字段名（含中文别名） -> 检索字段，见 SEARCH_FIELDS
+QUERY_FIELDS = {
+    'answer': ('answer', 'standard_answers', 'answers'),
+    '答案': ('answer', 'standard_answers', 'answers'),
+    'question': ('question',),
+    '题目': ('question',),
+    '问题': ('question',),
+    'options': ('options',),
+    '选项': ('options',),
+    'content': ('content',),
+    '内容': ('content',),
+    '原文': ('content', 'listening_text', 'dialogue'),
+    'listening': ('listening_text', 'dialogue'),
+    '听力': ('listening_text', 'dialogue'),
+    'analyze': ('analyze',),
+    '解析': ('analyze',),
+    'keywords': ('keywords',),
+    '关键词': ('keywords',),
+    'keypoint': ('keypoint',),
+    '关键点': ('keypoint',),
+    'topic': ('topic',),
+    '主题': ('topic',),
+}
+for _fields in SEARCH_FIELDS.values():
+    for _field in _fields:
+        QUERY_FIELDS.setdefault(_field, (_field,))
+
+# type: 的取值（含中文别名）
+QUERY_TYPES = {
+    'choose': 'choose', '选择': 'choose',
+    'dialogue': 'dialogue', '对话': 'dialogue',
+    'read': 'read', '阅读': 'read',
+    'fill': 'fill', '填空': 'fill',
+    'picture': 'picture', '图片': 'picture',
+}
+
+# 切词：括号、取反、带可选字段前缀的引号短语 / 正则 / 普通词
+_查询词法 = re.compile(r'''
+    \s*(?:
+        (?P<paren>[()])
+      | (?P<neg>-)(?=\S)
+      | (?:(?P<field>[^\s:()"/]+):)?
+        (?: "(?P<phrase>[^"]*)"
+          | /(?P<regex>(?:\\.|[^/\\])+)/(?P<flags>[a-z]*)
+          | (?P<word>[^\s()]+) )
+    )''', re.VERBOSE)
+
+class 查询语法错误(ValueError):
+    pass
+
+class _查询上下文:
+    # 一次查询里共用的取值函数，同一条记录的字段只拆一次
+    def __init__(self, index, fields_of):
+        self.index = index
+        self.fields_of = fields_of
+        self._fields = {}
+
+    def text(self, rid):
+        return self.index.texts[rid]
+
+    def record(self, rid):
+        return self.index.records[rid]
+
+    def fields(self, rid, names):
+        parts = self._fields.get(rid)
+        if parts is None:
+            parts = [(field, text.casefold()) for field, text in self.fields_of(self.record(rid))]
+            self._fields[rid] = parts
+        return [text for field, text in parts if field in names]
+
+class _词条:
+    # 子串（词或引号短语），可以限定字段；候选直接用索引
+    cost = 1
+
+    def __init__(self, text, fields=None):
+        self.text = text.casefold()
+        self.fields = fields
+        if fields:
+            self.cost = 2
+
+    def candidates(self, index):
+        ids = index.candidates(self.text) if self.text else None
+        return None if ids is None else set(ids)
+
+    def matches(self, ctx, rid):
+        if self.fields:
+            return any(self.text in part for part in ctx.fields(rid, self.fields))
+        return self.text in ctx.text(rid)
+
+class _正则:
+    # /正则/，不区分大小写；候选用正则里必须出现的最长一段字面量去索引里找
+    cost = 4
+
+    def __init__(self, pattern, flags='', fields=None):
+        try:
+            self.regex = re.compile(pattern, re.IGNORECASE | (re.DOTALL if 's' in flags else 0))
+        except re.error as e:
+            raise 查询语法错误(f"正则有误 /{pattern}/: {e}")
+        self.literal = _正则字面量(pattern)
+        self.fields = fields
+
+    def candidates(self, index):
+        if len(self.literal) < GRAM_SIZE:
+            return None
+        return set(index.candidates(self.literal))
+
+    def matches(self, ctx, rid):
+        if self.fields:
+            return any(self.regex.search(part) for part in ctx.fields(rid, self.fields))
+        return self.regex.search(ctx.text(rid)) is not None
+
+class _题型:
+    # type: 过滤要取记录本身，排在文本条件后面检查
+    cost = 3
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def candidates(self, index):
+        return None
+
+    def matches(self, ctx, rid):
+        return ctx.record(rid).type == self.kind
+
+class _与:
+    def __init__(self, children):
+        # 便宜的条件先检查
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = max(child.cost for child in children)
+
+    def candidates(self, index):
+        # 各条件候选的交集，从最小的开始；没法缩小范围的条件不参与
+        sets = []
+        for child in self.children:
+            ids = child.candidates(index)
+            if ids is not None:
+                if not ids:
+                    return ids
+                sets.append(ids)
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def matches(self, ctx, rid):
+        return all(child.matches(ctx, rid) for child in self.children)
+
+class _或:
+    def __init__(self, children):
+        self.children = sorted(children, key=lambda child: child.cost)
+        self.cost = max(child.cost for child in children)
+
+    def candidates(self, index):
+        # 并集，只要有一个条件没法缩小范围就整体扫描
+        result = set()
+        for child in self.children:
+            ids = child.candidates(index)
+            if ids is None:
+                return None
+            result |= ids
+        return result
+
+    def matches(self, ctx, rid):
+        return any(child.matches(ctx, rid) for child in self.children)
+
+class _非:
+    def __init__(self, child):
+        self.child = child
+        self.cost = child.cost
+
+    def candidates(self, index):
+        return None
+
+    def matches(self, ctx, rid):
+        return not self.child.matches(ctx, rid)
+
+# 正则里的 {m}、{m,}、{,n}、{m,n} 量词；其它写法的 { 是普通字符
+_正则次数 = re.compile(r'\{(?=\d|,)(\d*)(?:,(\d*))?\}')
+
+def _字符类结尾(pattern, i):
+    # pattern[i] 是 '['，返回对应 ']' 的位置；紧跟在 [ 或 [^ 后面的 ] 和转义的 \] 都是普通字符
+    n = len(pattern)
+    j = i + 1
+    if j < n and pattern[j] == '^':
+        j += 1
+    if j < n and pattern[j] == ']':
+        j += 1
+    while j < n:
+        if pattern[j] == '\\':
+            j += 2
+        elif pattern[j] == ']':
+            return j
+        else:
+            j += 1
+    return n
+
+def _正则字面量(pattern):
+    # 找正则里一定会出现的最长一段字面量（小写），找不到返回 ''
+    # 只处理简单情况：有 | 时不猜，分组和字符类里的内容不算，可以是 0 次的量词让前一个字符变成可选
+    if '|' in pattern:
+        return ''
+    runs = []
+    current = []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if depth == 0 and not escaped.isalnum():
+                current.append(escaped)
+            else:
+                runs.append(''.join(current))
+                current = []
+            continue
+        if c == '[':
+            # 整个字符类跳过
+            i = _字符类结尾(pattern, i)
+            runs.append(''.join(current))
+            current = []
+        elif c == '(':
+            depth += 1
+            runs.append(''.join(current))
+            current = []
+        elif c == ')':
+            depth = max(0, depth - 1)
+        elif c in '*?':
+            if current:
+                current.pop()
+            runs.append(''.join(current))
+            current = []
+        elif c == '{' and _正则次数.match(pattern, i):
+            # {m,n} 整个跳过，最少可以是 0 次时前一个字符才是可选的；重复之后接着的不再连续
+            m = _正则次数.match(pattern, i)
+            if current and not int(m.group(1) or 0):
+                current.pop()
+            runs.append(''.join(current))
+            current = []
+            i = m.end()
+            continue
+        elif c in '.^$+':
+            runs.append(''.join(current))
+            current = []
+        elif depth == 0:
+            current.append(c)
+        i += 1
+    runs.append(''.join(current))
+    return max(runs, key=len).casefold()
+
+def 解析查询(text):
+    # 查询语言 -> 条件树，语法：
+    #   表达式 := 与 (OR 与)*
+    #   与     := 一元 (AND? 一元)*
+    #   一元   := (NOT | -) 一元 | "(" 表达式 ")" | [字段:] (词 | "短语" | /正则/)
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _查询词法.match(text, pos)
+        if not m or m.end() == pos:
+            raise 查询语法错误(f"无法解析: {text[pos:]}")
+        pos = m.end()
+        tokens.append(m)
+    if not tokens:
+        raise 查询语法错误("查询为空")
+    n = 0
+
+    def peek():
+        return tokens[n] if n < len(tokens) else None
+
+    def is_keyword(m, *words):
+        return m is not None and m.group('field') is None and m.group('word') in words
+
+    def 表达式():
+        nonlocal n
+        children = [与()]
+        while is_keyword(peek(), 'OR', '|'):
+            n += 1
+            children.append(与())
+        return children[0] if len(children) == 1 else _或(children)
+
+    def 与():
+        nonlocal n
+        children = [一元()]
+        while True:
+            m = peek()
+            if m is None or m.group('paren') == ')' or is_keyword(m, 'OR', '|'):
+                break
+            if is_keyword(m, 'AND'):
+                n += 1
+            children.append(一元())
+        return children[0] if len(children) == 1 else _与(children)
+
+    def 一元():
+        nonlocal n
+        m = peek()
+        if m is None:
+            raise 查询语法错误("查询不完整")
+        if m.group('neg') or is_keyword(m, 'NOT'):
+            n += 1
+            return _非(一元())
+        if m.group('paren') == '(':
+            n += 1
+            node = 表达式()
+            if peek() is None or peek().group('paren') != ')':
+                raise 查询语法错误("缺少 )")
+            n += 1
+            return node
+        if m.group('paren') == ')':
+            raise 查询语法错误("多余的 )")
+        n += 1
+        return 条件(m)
+
+    def 条件(m):
+        field = m.group('field')
+        value = m.group('word')
+        if field is not None and field.casefold() in ('type', '题型'):
+            kind = QUERY_TYPES.get((value or m.group('phrase') or '').casefold())
+            if kind is None:
+                raise 查询语法错误(f"未知题型: {value}，可用: {', '.join(sorted(set(QUERY_TYPES.values())))}")
+            return _题型(kind)
+        fields = None
+        if field is not None:
+            fields = QUERY_FIELDS.get(field.casefold())
+            if fields is None:
+                # 不认识的字段名当成普通文字，比如 "3:30"
+                if value is not None:
+                    return _词条(f"{field}:{value}")
+                raise 查询语法错误(f"未知字段: {field}")
+            fields = frozenset(fields)
+        if m.group('regex') is not None:
+            return _正则(m.group('regex'), m.group('flags'), fields)
+        if m.group('phrase') is not None:
+            return _词条(m.group('phrase'), fields)
+        return _词条(value, fields)
+
+    node = 表达式()
+    if n < len(tokens):
+        raise 查询语法错误(f"多余的内容: {text[tokens[n].start():].strip()}")
+    return node
+
+def 高亮模式(keyword):
+    # 命令行结果里要高亮的内容 [(限定字段或 None, 正则)]，都对折叠后的文本匹配：
+    # 普通搜索是整个关键词；查询语言取不在 NOT 下面的词、短语和正则
+    if not keyword.startswith(QUERY_PREFIX):
+        k = keyword.casefold()
+        return [(None, re.compile(re.escape(k)))] if k else []
+    patterns = []
+
+    def walk(node):
+        if isinstance(node, (_与, _或)):
+            for child in node.children:
+                walk(child)
+        elif isinstance(node, _词条) and node.text:
+            patterns.append((node.fields, re.compile(re.escape(node.text))))
+        elif isinstance(node, _正则):
+            patterns.append((node.fields, node.regex))
+
+    walk(解析查询(keyword[len(QUERY_PREFIX):]))
+    return patterns
+
+def _原样(value):
+    return value
+
+class 运行统计:
+    # 分阶段计时、计数和查询延迟，--stats 时打印，方便定位启动慢的原因
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # 阶段 -> [累计秒数, 次数]
+        self.timers = {}
+        # 分组 -> {键: 数量}
+        self.counters = {}
+        # 最近的查询延迟（毫秒）和慢查询记录
+        self.latencies = deque(maxlen=QUERY_LATENCY_WINDOW)
+        self.query_count = 0
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += calls
+
+    def count(self, group, key, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            counter = self.counters.setdefault(group, {})
+            counter[key] = counter.get(key, 0) + n
+
+    def wrap(self, name, func):
+        # 给高频调用的方法包一层计时，只在开启统计时使用
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add_time(name, time.perf_counter() - start)
+        return timed
+
+    def record_query(self, kind, query, seconds, hits):
+        if not self.enabled:
+            return
+        ms = seconds * 1000
+        with self._lock:
+            self.query_count += 1
+            self.latencies.append(ms)
+            if ms >= SLOW_QUERY_MS:
+                self.slow_queries.append((time.strftime('%H:%M:%S'), kind, query, ms, hits))
+
+    def take(self):
+        # 取出并清空计时和计数，子进程把它交回主进程合并
+        with self._lock:
+            data = {'timers': self.timers, 'counters': self.counters}
+            self.timers = {}
+            self.counters = {}
+        return data
+
+    def merge(self, data):
+        if not data:
+            return
+        for name, (seconds, calls) in data['timers'].items():
+            self.add_time(name, seconds, calls)
+        for group, counter in data['counters'].items():
+            for key, n in counter.items():
+                self.count(group, key, n)
+
+    def report(self, c):
+        # c 是提供颜色属性的对象
+        lines = [f"{c.PURPLE}📊 运行统计{c.NC}"]
+        if self.timers:
+            lines.append(f"{c.CYAN}阶段耗时:{c.NC}")
+            for name, (seconds, calls) in sorted(self.timers.items(), key=lambda kv: -kv[1][0]):
+                lines.append(f"  {name:<14} {seconds * 1000:10.1f} ms  {calls} 次")
+        labels = {
+            'scan': '扫描', 'files': '文件', 'parsed': '重新解析的文件',
+            'records': '记录', 'failures': '解析失败', 'query_cache': '查询缓存',
+        }
+        for group, counter in self.counters.items():
+            items = '，'.join(f"{key} {n}" for key, n in sorted(counter.items()))
+            lines.append(f"{c.CYAN}{labels.get(group, group)}:{c.NC} {items}")
+        if self.query_count:
+            values = sorted(self.latencies)
+            p50 = values[len(values) // 2]
+            p90 = values[min(len(values) - 1, int(len(values) * 0.9))]
+            lines.append(f"{c.CYAN}查询:{c.NC} {self.query_count} 次，最近 {len(values)} 次 "
+                         f"平均 {sum(values) / len(values):.2f} ms，p50 {p50:.2f} ms，p90 {p90:.2f} ms，"
+                         f"最慢 {values[-1]:.2f} ms")
+        if self.slow_queries:
+            lines.append(f"{c.YELLOW}慢查询（≥{SLOW_QUERY_MS} ms）:{c.NC}")
+            for when, kind, query, ms, hits in self.slow_queries:
+                lines.append(f"  {when} [{kind}] {query!r} {ms:.1f} ms，{hits} 条结果")
+        return '\n'.join(lines)
+
+class 查询缓存:
+    # 最近查询的结果（记录编号），按 LRU 淘汰。边输入边搜索时 "wea" -> "weath" -> "weather"，
+    # 包含旧查询的新查询只需要在旧查询的结果里找；题库更新或重建索引时整个清空
+    def __init__(self, size=QUERY_CACHE_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        ids = self._entries.get(key)
+        if ids is not None:
+            self._entries.move_to_end(key)
+        return ids
+
+    def put(self, key, ids):
+        self._entries[key] = ids
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def narrowest(self, k):
+        # 缓存的子串查询里结果最少的一个：包含 k 的文本一定也包含它的任何子串
+        best = None
+        for key, ids in self._entries.items():
+            if not key.startswith(QUERY_PREFIX) and key in k and (best is None or len(ids) < len(best)):
+                best = ids
+        return best
+
+    def clear(self):
+        self._entries.clear()
 
 class ETS数据提取器:
-    def __init__(self, root_dir):
+    # 用 打开索引() 从二进制索引文件创建时是文件路径，这时题库只读
+    index_file = None
+    # use_sqlite() 之后普通搜索改走这个 SQLite题库 的 FTS5 表
+    sqlite_backend = None
+    # 相似题索引，打开二进制索引时用文件里的签名和分桶
+    _similar = None
+    # 命令行上一次显示的结果，/similar #n 用
+    _last_results = ()
+
+    def __init__(self, root_dir, use_cache=True, jobs=1, stats=False):
         self.root_dir = Path(root_dir).resolve()
         if not self.root_dir.is_dir():
             raise ValueError(f"无效目录: {root_dir}")
         self.all_data = []
+        self.use_cache = use_cache
+        self.scan_stats = {'dirs': 0, 'entries': 0}
+        # 监视模式下后台更新和查询共用的锁
+        self._lock = threading.RLock()
+        # 同一时间只允许一次 refresh（监视线程和守护进程的 /reload 可能同时触发）
+        self._refresh_lock = threading.Lock()
+        # 并行解析的进程/线程数，0 表示按 CPU 核数
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.stats = 运行统计(stats)
+        self._install_stats()
         self.setup_colors()
+        self._html_cache = {}
+        self._query_cache = 查询缓存()
+        # 解析期间 material 目录的文件列表，见 _material_listing
+        self._listings = {}
+        # 内容指纹 -> 记录，重复的题目只保留一条
+        self._by_fingerprint = {}
         self._parse_all_data()
+        self._load_index()
+
+    @classmethod
+    def _解析器实例(cls, stats=False):
+        # 只用来解析的实例，不扫描目录，给并行解析的子进程用
+        obj = cls.__new__(cls)
+        obj.all_data = []
+        obj._html_cache = {}
+        obj._query_cache = 查询缓存()
+        obj._listings = {}
+        obj._lock = threading.RLock()
+        obj.stats = 运行统计(stats)
+        obj._install_stats()
+        obj.setup_colors()
+        return obj
+
+    @classmethod
+    def 打开索引(cls, index_file, stats=False):
+        # 从 export_index 导出的二进制索引创建实例：不扫描目录也不解析，
+        # all_data 是按需解码的只读序列，启动时间和内存都和题库大小无关
+        obj = cls._解析器实例(stats)
+        with obj.stats.phase('index'):
+            obj.index = 映射索引(index_file)
+            obj._similar = 映射相似索引(obj.index)
+        obj.index_file = str(index_file)
+        obj.root_dir = Path(obj.index.meta.get('root', ''))
+        obj.all_data = obj.index.records
+        obj._refresh_lock = threading.Lock()
+        return obj
+
+    def export_index(self, path):
+        # 把当前题库写成二进制索引文件，之后用 --index 直接打开
+        with self._lock, self.stats.phase('export_index'):
+            index, similar = self.index, self._similar
+            if index.dead or similar is None or similar.dead:
+                # 两个索引的编号要一致，有空位时一起按现有记录重建
+                live = [item for item in index.records if item is not None]
+                index, similar = 搜索索引(live, self._search_fields), 相似索引(live)
+            index.save(path, {'root': str(self.root_dir), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                              'cache_version': CACHE_VERSION}, similar)
+
+    def export_sqlite(self, path):
+        # 把题库写进 SQLite（见 SQLite题库），已有的数据库只更新变化的源文件，返回 (写入的源文件数, 删除的源文件数)
+        if self.index_file:
+            raise RuntimeError("从二进制索引打开的题库没有源文件信息，请用 --root 打开题库目录")
+        backend = self.sqlite_backend
+        db = backend if backend is not None and backend.path == str(path) else SQLite题库(path, self.root_dir)
+        try:
+            with self._lock, self.stats.phase('export_sqlite'):
+                return db.sync(self._unit_sigs, self._unit_items, self._search_fields)
+        finally:
+            if db is not backend:
+                db.close()
+
+    def use_sqlite(self, path=None):
+        # 普通搜索改用 SQLite 的 FTS5，数据库默认放在题库目录旁边，启动和增量更新时自动同步
+        # 查询语言（? 开头）和排序搜索仍然用内存索引
+        if self.index_file:
+            raise RuntimeError("从二进制索引打开的题库不能使用 SQLite 后端")
+        db = SQLite题库(path or self._sqlite_file(), self.root_dir)
+        with self._lock:
+            self.sqlite_backend = db
+            self._sync_sqlite()
+        print(f"{self.CYAN}🗄️  使用 SQLite 搜索后端 {db.path}{self.NC}")
+
+    def _sqlite_file(self):
+        return self.root_dir.parent / f".{self.root_dir.name}.fuckets.sqlite"
+
+    def _sync_sqlite(self):
+        # 调用时要持有 self._lock；同步后重建 records.id -> 内存记录 的对照表
+        with self.stats.phase('sqlite_sync'):
+            self.sqlite_backend.sync(self._unit_sigs, self._unit_items, self._search_fields)
+            self._sqlite_items = {rid: self._by_fingerprint[fingerprint]
+                                  for rid, fingerprint in self.sqlite_backend.fingerprints()}
+
+    def _install_stats(self):
+        # 开启统计时给 JSON 解码、HTML 清理和素材检查包上计时
+        if self.stats.enabled:
+            self._load_json = self.stats.wrap('json_decode', self._load_json)
+            self._clean_html = self.stats.wrap('clean_html', self._clean_html)
+            self._asset_exists = self.stats.wrap('asset_check', self._asset_exists)
+
+    def print_stats(self):
+        print(self.stats.report(self))
 
     def setup_colors(self):
         # 设置颜色代码
@@ -52,42 +1758,446 @@ class ETS数据提取器:
         self.ORANGE = '\033[1;38;5;214m'
         self.MAGENTA = '\033[1;35m'
         self.NC = '\033[0m'
+        # 反色显示命中的内容，结束时只关掉反色，保留外面的颜色
+        self.HIGHLIGHT = '\033[7m'
+        self.HIGHLIGHT_END = '\033[27m'
         if platform.system() == 'Windows':
             try:
                 import ctypes
                 kernel32 = ctypes.windll.kernel32
                 kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
             except Exception:
-                for attr in ['RED', 'GREEN', 'YELLOW', 'BLUE', 'PURPLE', 'CYAN', 'WHITE', 'ORANGE', 'MAGENTA', 'NC']:
+                for attr in ['RED', 'GREEN', 'YELLOW', 'BLUE', 'PURPLE', 'CYAN', 'WHITE', 'ORANGE', 'MAGENTA', 'NC',
+                             'HIGHLIGHT', 'HIGHLIGHT_END']:
                     setattr(self, attr, '')
 
     def _parse_all_data(self):
-        # 解析所有文件
-        template_dirs = []
-        for dir_path in self.root_dir.rglob("*"):
-            if dir_path.is_dir() and (dir_path / "ctrl.json").exists() and \
-               (dir_path / "info.json").exists() and (dir_path / "res.json").exists():
-                template_dirs.append(dir_path)
-                self._parse_pc_template(dir_path)
-                
-        # 同时支持移动版
-        for content_path in self.root_dir.rglob("content.json"):
-            self._parse_content_file(content_path)
+        # 解析所有文件，文件没变的直接用缓存里的结果
+        with self.stats.phase('cache_load'):
+            cache = self._load_cache()
+        new_cache = {}
+        with self.stats.phase('walk'):
+            units, template_dirs = self._walk_tree()
+        self.stats.count('scan', '目录', self.scan_stats['dirs'])
+        self.stats.count('scan', '条目', self.scan_stats['entries'])
+        # 每个源文件的签名和 [(记录, 来源)]，监视模式增量更新时用
+        self._unit_sigs = {}
+        self._unit_items = {}
+
+        # 先找出缓存失效的文件，统一交给解析池
+        plan = []
+        stale = []
+        for kind, path in units:
+            key = self._unit_key(kind, path)
+            with self.stats.phase('signature'):
+                sig = self._unit_signature(kind, path)
+            self._unit_sigs[key] = sig
+            self.stats.count('files', kind)
+            entry = cache.get(key)
+            if sig is not None and entry is not None and entry.get('sig') == sig:
+                plan.append((key, sig, entry))
+            else:
+                plan.append((key, sig, None))
+                stale.append((kind, path))
+        with self.stats.phase('parse'):
+            parsed = iter(self._parse_units(stale))
+        reparsed = len(stale)
+
+        # 按扫描顺序合并，结果和顺序解析一致
+        for key, sig, entry in plan:
+            if entry is None:
+                records, assets = next(parsed)
+                # 解析失败的不写缓存，下次启动还会重试并提示
+                if records is None:
+                    continue
+                entry = {'sig': sig, 'records': records, 'assets': assets}
+            records = entry['records']
+            if sig is not None:
+                new_cache[key] = entry
+            # 缓存里存字典，内存里存紧凑记录
+            self.all_data.extend(self._add_unit(key, records))
+            for r in records:
+                self.stats.count('records', r['type'])
+        merged = sum(len(entries) for entries in self._unit_items.values()) - len(self.all_data)
+
+        self._cache_entries = new_cache
+        dropped = len(cache.keys() - new_cache.keys())
+        if self.use_cache and (reparsed or dropped):
+            with self.stats.phase('cache_save'):
+                self._save_cache(new_cache)
             
         # 输出结果
         if template_dirs:
             print(f"{self.GREEN}✅ 成功解析了 {len(template_dirs)} 个题库文件夹{self.NC}")
+        print(f"{self.CYAN}📂 扫描了 {self.scan_stats['dirs']} 个目录，{self.scan_stats['entries']} 个条目{self.NC}")
+        if merged:
+            print(f"{self.CYAN}🧬 合并了 {merged} 条重复题目，剩余 {len(self.all_data)} 条{self.NC}")
+        if self.use_cache and cache:
+            print(f"{self.CYAN}♻️  缓存命中 {len(units) - reparsed} 个文件，重新解析 {reparsed} 个，移除 {dropped} 个{self.NC}")
+
+    # --------------------------监视模式：增量更新
+
+    def refresh(self):
+        # 重新扫描目录，只解析新增或变化的文件，返回 (更新的文件数, 删除的文件数)
+        if self.index_file:
+            raise RuntimeError(f"题库来自二进制索引 {self.index_file}，请重新导出索引后再打开")
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        units, _ = self._walk_tree()
+        current = {}
+        for kind, path in units:
+            current[self._unit_key(kind, path)] = (kind, path)
+        changed = []
+        for key, (kind, path) in current.items():
+            sig = self._unit_signature(kind, path)
+            if key not in self._unit_sigs or self._unit_sigs[key] != sig:
+                changed.append((key, kind, path, sig))
+        removed = [key for key in self._unit_sigs if key not in current]
+        if not changed and not removed:
+            return 0, 0
+
+        # 解析在锁外进行，不挡住查询
+        parsed = self._parse_units([(kind, path) for _, kind, path, _ in changed])
+        with self._lock:
+            # 先加新来源再去掉旧来源，内容没变的题目不会被删了又重建
+            old_entries = []
+            new_items = []
+            for key in removed:
+                old_entries.extend(self._unit_items.pop(key, ()))
+                self._unit_sigs.pop(key, None)
+                self._cache_entries.pop(key, None)
+            for (key, kind, path, sig), (records, assets) in zip(changed, parsed):
+                old_entries.extend(self._unit_items.pop(key, ()))
+                self._unit_sigs[key] = sig
+                if records is None:
+                    self._cache_entries.pop(key, None)
+                    continue
+                if sig is not None:
+                    self._cache_entries[key] = {'sig': sig, 'records': records, 'assets': assets}
+                new_items.extend(self._add_unit(key, records))
+            self._apply_changes(self._drop_entries(old_entries), new_items)
+            if self.sqlite_backend is not None:
+                self._sync_sqlite()
+        if self.use_cache:
+            self._save_cache(self._cache_entries)
+        return len(changed), len(removed)
+
+    def _add_unit(self, key, records):
+        # 把一个源文件的记录并入题库，返回新出现的记录；重复的只给已有记录加一个来源
+        entries = []
+        new_items = []
+        for data in records:
+            item = 生成记录(data)
+            source = item._sources[0]
+            fingerprint = item.fingerprint()
+            existing = self._by_fingerprint.get(fingerprint)
+            if existing is None:
+                self._by_fingerprint[fingerprint] = item
+                new_items.append(item)
+            else:
+                existing._sources.append(source)
+                self._html_cache.pop(existing, None)
+                self.stats.count('dedup', item.type)
+                item = existing
+            entries.append((item, source))
+        self._unit_items[key] = entries
+        return new_items
+
+    def _drop_entries(self, entries):
+        # 去掉这些来源，返回来源全部被删掉、要从题库移除的记录
+        gone = []
+        for item, source in entries:
+            # 电脑版记录的指纹用到主来源的音频，要在删来源之前算
+            fingerprint = item.fingerprint()
+            item._sources.remove(source)
+            if item._sources:
+                self._html_cache.pop(item, None)
+            else:
+                self._by_fingerprint.pop(fingerprint, None)
+                gone.append(item)
+        return gone
+
+    def _apply_changes(self, old_items, new_items):
+        # 原地更新 all_data 和索引，缓存的查询结果不再准确
+        self._query_cache.clear()
+        if old_items:
+            dead = set(old_items)
+            self.all_data[:] = [item for item in self.all_data if item not in dead]
+            self.index.remove(old_items)
+            for item in old_items:
+                self._html_cache.pop(item, None)
+        self.all_data.extend(new_items)
+        self.index.add(new_items)
+        if self._similar is not None:
+            self._similar.remove(old_items)
+            self._similar.add(new_items)
+        # 空位太多时整体重建，保持倒排表紧凑
+        if self.index.dead > self.index.live_count:
+            self._build_index()
+
+    def start_watch(self, interval=WATCH_INTERVAL):
+        # 后台线程定时检查题库变化
+        if self.index_file:
+            print(f"{self.YELLOW}⚠️  从二进制索引打开的题库不支持监视模式{self.NC}")
+            return None
+        def loop():
+            while not self._watch_stop.wait(interval):
+                try:
+                    updated, removed = self.refresh()
+                except Exception as e:
+                    print(f"\n{self.RED}❌ 更新题库失败: {e}{self.NC}")
+                    continue
+                if updated or removed:
+                    print(f"\n{self.GREEN}🔄 题库有变化：更新 {updated} 个文件，移除 {removed} 个，"
+                          f"当前共 {len(self.all_data)} 条题目{self.NC}")
+
+        self._watch_stop = threading.Event()
+        thread = threading.Thread(target=loop, name="ets-watch", daemon=True)
+        thread.start()
+        print(f"{self.CYAN}👀 已开启监视模式，每 {interval:g} 秒检查一次题库变化{self.NC}")
+        return thread
+
+    def stop_watch(self):
+        if getattr(self, '_watch_stop', None) is not None:
+            self._watch_stop.set()
+
+    def _walk_tree(self):
+        # 用 os.scandir 单次遍历目录树，每个目录只列一次，不再逐个 exists()
+        # 返回 (待解析列表, 电脑版题库目录)，电脑版在前、移动版在后
+        template_dirs = []
+        content_files = []
+        dirs = entries = 0
+        stack = [str(self.root_dir)]
+        while stack:
+            current = stack.pop()
+            dirs += 1
+            try:
+                with os.scandir(current) as it:
+                    listing = sorted(it, key=lambda e: e.name)
+            except OSError:
+                continue
+            entries += len(listing)
+            names = set()
+            subdirs = []
+            for entry in listing:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        names.add(entry.name)
+                except OSError:
+                    continue
+            dir_path = Path(current)
+            # 根据目录里的文件名判断类型
+            if PC_TEMPLATE_FILES <= names:
+                template_dirs.append(dir_path)
+            if 'content.json' in names:
+                content_files.append(dir_path / 'content.json')
+            # 倒序压栈，保证按名字顺序深度优先
+            stack.extend(reversed(subdirs))
+        self.scan_stats = {'dirs': dirs, 'entries': entries}
+        units = [('pc', d) for d in template_dirs] + [('content', f) for f in content_files]
+        return units, template_dirs
+
+    def _parse_unit(self, kind, path: Path):
+        # 按类型分发到对应的解析方法，返回 (记录, 用到的素材 {文件名: 大小})，解析失败时记录为 None
+        if kind == 'pc':
+            records = self._parse_pc_template(path)
+        else:
+            records = self._parse_content_file(path)
+        return records, self._asset_sizes(self._material_dir(kind, path), records)
+
+    def _parse_units(self, units):
+        # 解析一批文件，结果顺序和 units 一致
+        # 目录列表只在这一批里有效，题库变了下次要重新列
+        self._listings = {}
+        try:
+            return self._parse_units_now(units)
+        finally:
+            self._listings = {}
+
+    def _parse_units_now(self, units):
+        if self.jobs <= 1 or len(units) < 2:
+            return [self._parse_unit(kind, path) for kind, path in units]
+        import concurrent.futures
+        import functools
+        from concurrent.futures.process import BrokenProcessPool
+        chunksize = max(1, len(units) // (self.jobs * 4))
+        try:
+            # JSON 解码吃 CPU，优先用多进程
+            task = functools.partial(_并行解析, with_stats=self.stats.enabled)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                results = []
+                for result, worker_stats in pool.map(task, units, chunksize=chunksize):
+                    # 子进程的计时和计数合并回来
+                    self.stats.merge(worker_stats)
+                    results.append(result)
+                return results
+        except (OSError, ImportError, NotImplementedError, BrokenProcessPool) as e:
+            # Termux 等环境没有可用的多进程支持，退回线程池
+            print(f"{self.YELLOW}⚠️  多进程不可用（{e}），改用线程池解析{self.NC}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            return list(pool.map(lambda unit: self._parse_unit(*unit), units))
+
+    # --------------------------素材目录
+
+    @staticmethod
+    def _material_dir(kind, path: Path):
+        # 电脑版素材在题库目录下，移动版在 content.json 旁边
+        return path / "material" if kind == 'pc' else path.parent / "material"
+
+    def _material_listing(self, material: Path):
+        # 每个 material 目录只列一次，得到 {文件名: DirEntry}，所有素材检查都查这张表
+        # 文件大小在用到时才从 DirEntry 取，Windows 上不需要额外的 stat
+        key = str(material)
+        listing = self._listings.get(key)
+        if listing is None:
+            listing = {}
+            try:
+                with os.scandir(key) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file():
+                                listing[entry.name] = entry
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            self._listings[key] = listing
+            self.stats.count('scan', '素材目录')
+        return listing
+
+    def _asset_sizes(self, material: Path, records):
+        # 记录里引用到的音频和图片 {文件名: 大小}，写进缓存给 verify_assets 用
+        # 只有 Windows 的 DirEntry 自带大小；其它系统取大小要多一次 stat，记成 None，等 verify_assets 再补
+        listing = self._material_listing(material)
+        sizes = {}
+        for record in records or ():
+            for field in ('audio', 'image'):
+                name = os.path.basename(record.get(field) or '')
+                entry = listing.get(name)
+                if entry is not None and name not in sizes:
+                    sizes[name] = None
+                    if is_win:
+                        try:
+                            sizes[name] = entry.stat().st_size
+                        except OSError:
+                            pass
+        return sizes
+
+    def verify_assets(self):
+        # 批量检查缓存里记录的素材：每个 material 目录列一次，和记下的大小比较
+        # 还没有记下大小的素材这次只检查是否存在、是否为空，并把大小补进缓存，下次检查时比较
+        # 返回 [(源文件, 文件名, 问题)]，不在启动路径上运行
+        if self.index_file:
+            raise RuntimeError("从二进制索引打开的题库没有素材记录，请用 --root 打开题库目录")
+        with self._lock:
+            entries = sorted(self._cache_entries.items())
+        problems = []
+        recorded = 0
+        self._listings = {}
+        try:
+            for key, entry in entries:
+                kind, rel = key.split(':', 1)
+                listing = self._material_listing(self._material_dir(kind, self.root_dir / rel))
+                assets = entry.get('assets', {})
+                for name, size in assets.items():
+                    found = listing.get(name)
+                    if found is None:
+                        problems.append((key, name, '文件不存在'))
+                        continue
+                    try:
+                        actual = found.stat().st_size
+                    except OSError as e:
+                        problems.append((key, name, f'无法读取: {e}'))
+                        continue
+                    if size is None:
+                        assets[name] = actual
+                        recorded += 1
+                    elif actual != size:
+                        problems.append((key, name, f'大小变化 {size} -> {actual}'))
+                        continue
+                    if actual == 0:
+                        problems.append((key, name, '空文件'))
+        finally:
+            self._listings = {}
+        if recorded and self.use_cache:
+            with self._lock:
+                self._save_cache(self._cache_entries)
+        return problems
+
+    # --------------------------解析缓存
+
+    def _cache_file(self):
+        # 缓存文件放在题库目录旁边
+        return self.root_dir.parent / f".{self.root_dir.name}.fucketscache.json"
+
+    def _unit_key(self, kind, path: Path):
+        return f"{kind}:{path.relative_to(self.root_dir).as_posix()}"
+
+    def _unit_signature(self, kind, path: Path):
+        # 用源文件的 mtime 和大小判断是否需要重新解析
+        # material 目录的 mtime 也算进去，音频增删时会跟着失效
+        if kind == 'pc':
+            files = [path / "info.json", path / "res.json"]
+            material = path / "material"
+        else:
+            files = [path]
+            material = path.parent / "material"
+        sig = []
+        try:
+            for f in files:
+                st = f.stat()
+                sig.append([st.st_mtime_ns, st.st_size])
+        except OSError:
+            return None
+        try:
+            sig.append([material.stat().st_mtime_ns, 0])
+        except OSError:
+            sig.append([0, 0])
+        return sig
+
+    def _load_cache(self):
+        if not self.use_cache:
+            return {}
+        try:
+            with open(self._cache_file(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"{self.YELLOW}⚠️  缓存文件损坏，将重新解析: {e}{self.NC}")
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION \
+           or data.get('root') != str(self.root_dir):
+            return {}
+        entries = data.get('entries')
+        return entries if isinstance(entries, dict) else {}
+
+    def _save_cache(self, entries):
+        cache_file = self._cache_file()
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        data = {'version': CACHE_VERSION, 'root': str(self.root_dir), 'entries': entries}
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            print(f"{self.YELLOW}⚠️  写入缓存失败（{cache_file}）: {e}{self.NC}")
     
+    # --------------------------各类题库的解析
+
     def _parse_pc_template(self, dir_path: Path):
         # 解析电脑版题库
+        records = []
         try:
             # 读取 info.json
-            with open(dir_path / "info.json", 'r', encoding='utf-8') as f:
-                info_data = json.load(f)
+            info_data = self._load_json(dir_path / "info.json")
             
             # 读取 res.json
-            with open(dir_path / "res.json", 'r', encoding='utf-8') as f:
-                res_data = json.load(f)
+            res_data = self._load_json(dir_path / "res.json")
             
             # 创建信息映射
             info_map = {item['code_id']: item['code_value'] for item in info_data}
@@ -104,21 +2214,22 @@ class ETS数据提取器:
                     if exam_type_collect == 'collector.read':
                         # 模仿朗读
                         content_file = dir_path / "material" / "content.mp3"
-                        if content_file.exists():
-                            self.all_data.append({
+                        if self._asset_exists(content_file):
+                            records.append({
                                 'type': 'read',
                                 'id': exam_id,
                                 'content': f"{exam_type_name}",
                                 'analyze': '',
                                 'audio': str(content_file),
                                 'directory': str(dir_path),
+                                'template': 'pc',
                             })
                     elif exam_type_collect in ['collector.role', 'collector.dialogue']:
                         # 听选信息和回答问题
                         for i in range(1, 5):  # 最多4个问题
                             audio_file = dir_path / "material" / f"ques{i}askaudio.mp3"
-                            if audio_file.exists():
-                                self.all_data.append({
+                            if self._asset_exists(audio_file):
+                                records.append({
                                     'type': 'dialogue',
                                     'id': f"{exam_id}_{i}",
                                     'question': f"{exam_type_name} 问题 {i}",
@@ -127,12 +2238,13 @@ class ETS数据提取器:
                                     'keywords': '',
                                     'audio': str(audio_file),
                                     'directory': str(dir_path),
+                                    'template': 'pc',
                                 })
                     elif exam_type_collect == 'collector.picture':
                         # 信息转述
                         content_file = dir_path / "material" / "content.mp3"
-                        if content_file.exists():
-                            self.all_data.append({
+                        if self._asset_exists(content_file):
+                            records.append({
                                 'type': 'picture',
                                 'id': exam_id,
                                 'content': f"{exam_type_name}",
@@ -142,31 +2254,39 @@ class ETS数据提取器:
                                 'image': '',
                                 'audio': str(content_file),
                                 'directory': str(dir_path),
+                                'template': 'pc',
                             })
         except Exception as e:
             print(f"{self.RED}❌ 解析题库失败（{dir_path}）: {e}{self.NC}")
+            self.stats.count('failures', 'pc')
+            return None
+        self.stats.count('parsed', 'pc')
+        return records
 
     def _parse_content_file(self, file_path: Path):
         # 解析content.json文件
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._load_json(file_path)
         except json.JSONDecodeError as e:
             print(f"{self.RED}❌ JSON 格式错误（{file_path}）: {e}{self.NC}")
-            return
+            self.stats.count('failures', 'JSON错误')
+            return None
         except Exception as e:
             print(f"{self.RED}❌ 读取文件失败（{file_path}）: {e}{self.NC}")
-            return
+            self.stats.count('failures', '读取失败')
+            return None
 
         if not isinstance(data, dict):
             print(f"{self.RED}❌ content.json 根节点非对象: {file_path}{self.NC}")
-            return
+            self.stats.count('failures', '格式错误')
+            return None
 
         stype = data.get('structure_type')
         info = data.get('info')
         if stype is None or info is None:
             print(f"{self.YELLOW}⚠️  content.json 缺少 structure_type 或 info: {file_path}{self.NC}")
-            return
+            self.stats.count('failures', '缺少字段')
+            return None
 
         dir_path = file_path.parent
         handlers = {
@@ -179,24 +2299,35 @@ class ETS数据提取器:
         }
         handler = handlers.get(stype)
         if handler:
-            handler(dir_path, info)
-        else:
-            print(f"{self.YELLOW}⚠️  未知 structure_type: {stype} in {file_path}{self.NC}")
+            self.stats.count('parsed', stype)
+            return handler(dir_path, info)
+        print(f"{self.YELLOW}⚠️  未知 structure_type: {stype} in {file_path}{self.NC}")
+        self.stats.count('failures', str(stype))
+        return None
+
+    def _load_json(self, path: Path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _asset_exists(self, path: Path):
+        # 检查素材文件是否存在：查所在目录的文件列表，不再逐个 stat
+        return path.name in self._material_listing(path.parent)
 
     def _safe_get_audio(self, dir_path: Path, audio_name):
         # 安全获取音频文件路径
         if not isinstance(audio_name, str) or not audio_name:
             return ''
         material_path = dir_path / "material" / audio_name
-        return str(material_path) if material_path.is_file() else ''
+        return str(material_path) if self._asset_exists(material_path) else ''
 
     def _parse_dialogue_data(self, dir_path: Path, info):
         # 处理对话类型数据
         if not isinstance(info, dict):
-            return
+            return []
         questions = info.get('question')  # 获取问题列表
         if not isinstance(questions, list):
-            return
+            return []
+        records = []
         for q in questions:
             if not isinstance(q, dict):
                 continue
@@ -223,7 +2354,7 @@ class ETS数据提取器:
             audio = self._safe_get_audio(dir_path, q.get('askaudio'))
             
             # 添加到数据列表中
-            self.all_data.append({
+            records.append({
                 'type': 'dialogue',
                 'id': q.get('xh', ''),
                 'question': clean_question,  # 清理后的问题
@@ -233,30 +2364,32 @@ class ETS数据提取器:
                 'audio': audio,
                 'directory': str(dir_path),
             })
+        return records
 
     def _parse_read_data(self, dir_path: Path, info):
         # 处理阅读类型
         if not isinstance(info, dict):
-            return
+            return []
         audio = self._safe_get_audio(dir_path, info.get('audio'))
         # 直接构造数据
-        self.all_data.append({
+        return [{
             'type': 'read',
             'id': info.get('stid', ''),
             'content': self._clean_html(info.get('value', '')),
             'analyze': self._clean_html(info.get('analyze', '')),
             'audio': audio,
             'directory': str(dir_path),
-        })
+        }]
 
     def _parse_choose_data(self, dir_path: Path, info):
         if not isinstance(info, dict):
-            return
+            return []
         dialogue = self._clean_html(info.get('st_nr', ''))
         audio = self._safe_get_audio(dir_path, info.get('audio'))
         xtlist = info.get('xtlist')  # 题目列表
         if not isinstance(xtlist, list):
-            return
+            return []
+        records = []
         for q in xtlist:
             if not isinstance(q, dict):
                 continue
@@ -268,7 +2401,7 @@ class ETS数据提取器:
                            for opt in xxlist if isinstance(opt, dict)]
             # 这里要注意移除ets_th占位符
             question_text = q.get('xt_nr', '').replace('ets_th1', '').replace('ets_th2', '').strip()
-            self.all_data.append({
+            records.append({
                 'type': 'choose',
                 'id': q.get('xt_xh', ''),
                 'dialogue': dialogue,
@@ -279,10 +2412,11 @@ class ETS数据提取器:
                 'audio': audio,
                 'directory': str(dir_path),
             })
+        return records
 
     def _parse_fill_data(self, dir_path: Path, info):
         if not isinstance(info, dict):
-            return
+            return []
         audio = self._safe_get_audio(dir_path, info.get('audio'))
         std_list = info.get('std')  # 标准答案列表
         if not isinstance(std_list, list):
@@ -290,7 +2424,7 @@ class ETS数据提取器:
         else:
             answers = [{'number': item.get('th', ''), 'value': item.get('value', '')}
                        for item in std_list if isinstance(item, dict)]
-        self.all_data.append({
+        return [{
             'type': 'fill',
             'id': info.get('stid', ''),
             'content': self._clean_html(info.get('value', '')),
@@ -298,17 +2432,17 @@ class ETS数据提取器:
             'keypoint': self._clean_html(info.get('keypoint', '')),
             'audio': audio,
             'directory': str(dir_path),
-        })
+        }]
 
     def _parse_picture_data(self, dir_path: Path, info):
         # 图片题处理，需要处理图片路径
         if not isinstance(info, dict):
-            return
+            return []
         audio = self._safe_get_audio(dir_path, info.get('audio'))
         image_name = info.get('image')
         image_path = dir_path / "material" / image_name if image_name else None
-        image = str(image_path) if image_path and image_path.is_file() else ''
-        self.all_data.append({
+        image = str(image_path) if image_path and self._asset_exists(image_path) else ''
+        return [{
             'type': 'picture',
             'id': info.get('stid', ''),
             'content': self._clean_html(info.get('value', '')),
@@ -318,122 +2452,368 @@ class ETS数据提取器:
             'image': image,
             'audio': audio,
             'directory': str(dir_path),
-        })
+        }]
 
     def _clean_html(self, text):
         # 清理HTML标签和特殊字符
         if not isinstance(text, str):
             return ""
-        # 移除标签
-        text = re.sub(r'<[^>]+>', '', text)
-        # 替换实体字符
-        replacements = {
-            '&nbsp;': ' ',
-            '&amp;': '&',
-            '&quot;': '"',
-            '<': '<',
-            '>': '>',
-        }
-        for k, v in replacements.items():
-            text = text.replace(k, v)
-        # 处理换行
-        text = re.sub(r'</?br\s*/?>', '\n', text, flags=re.IGNORECASE)
-        # 清理占位符
-        text = re.sub(r'ets_th\d+', '', text)
-        # 合并空格
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        # 纯文本只需要合并空白
+        if '<' not in text and '&' not in text and 'ets_th' not in text:
+            return ' '.join(text.split())
+        # 一次正则替换处理标签、实体和占位符，换行标签先换成 \x00 占位
+        text = _HTML_TOKEN.sub(_替换HTML片段, text)
+        if '\x00' not in text:
+            return ' '.join(text.split())
+        # 每行内部合并空白，去掉空行
+        lines = (' '.join(line.split()) for line in text.split('\x00'))
+        return '\n'.join(line for line in lines if line)
 
     # --------------------------下面是各种打印方法
 
-    def _print_choose(self, q):
+    # 打印方法都写进 out（行的列表），由调用方一次写到终端；mark 给字段值加命中高亮
+
+    def _print_choose(self, q, out, mark):
         if q.get('dialogue'):
-            print(f"{self.BLUE}对话原文:{self.NC}\n{self.WHITE}{q['dialogue']}{self.NC}\n")
-        print(f"{self.CYAN}题目 {q.get('id', '')}:{self.NC} {q.get('question', '')}")
-        print(f"{self.GREEN}正确答案: {q.get('answer', '')}{self.NC}")
-        print(f"{self.YELLOW}选项:{self.NC}")
+            out.append(f"{self.BLUE}对话原文:{self.NC}\n{self.WHITE}{mark(q['dialogue'])}{self.NC}\n")
+        out.append(f"{self.CYAN}题目 {q.get('id', '')}:{self.NC} {mark(q.get('question', ''))}")
+        out.append(f"{self.GREEN}正确答案: {mark(q.get('answer', ''))}{self.NC}")
+        out.append(f"{self.YELLOW}选项:{self.NC}")
         for opt in q.get('options', []):
-            print(f"  {opt}")
-        print()
+            out.append(f"  {mark(opt)}")
+        out.append("")
 
-    def _print_dialogue(self, q):
-        print(f"{self.CYAN}问题 {q.get('id', '')}:{self.NC} {q.get('question', '')}")
+    def _print_dialogue(self, q, out, mark):
+        out.append(f"{self.CYAN}问题 {q.get('id', '')}:{self.NC} {mark(q.get('question', ''))}")
         if q.get('listening_text'):
-            print(f"{self.BLUE}听力原文:{self.NC} {q.get('listening_text', '')}")
+            out.append(f"{self.BLUE}听力原文:{self.NC} {mark(q.get('listening_text', ''))}")
         if q.get('standard_answers'):
-            print(f"{self.GREEN}标准答案:{self.NC} {'; '.join(q['standard_answers'])}")
+            out.append(f"{self.GREEN}标准答案:{self.NC} {'; '.join(mark(a) for a in q['standard_answers'])}")
         if q.get('keywords'):
-            print(f"{self.YELLOW}关键词:{self.NC} {q.get('keywords', '')}")
-        print()
+            out.append(f"{self.YELLOW}关键词:{self.NC} {mark(q.get('keywords', ''))}")
+        out.append("")
 
-    def _print_read(self, q):
-        print(f"{self.ORANGE}阅读内容:{self.NC}\n{self.WHITE}{q.get('content', '')}{self.NC}\n")
+    def _print_read(self, q, out, mark):
+        out.append(f"{self.ORANGE}阅读内容:{self.NC}\n{self.WHITE}{mark(q.get('content', ''))}{self.NC}\n")
 
-    def _print_fill(self, q):
-        print(f"{self.MAGENTA}填空题:{self.NC}")
-        print(f"{self.BLUE}原文:{self.NC}\n{self.WHITE}{q.get('content', '')}{self.NC}\n")
-        print(f"{self.YELLOW}填空答案:{self.NC}")
+    def _print_fill(self, q, out, mark):
+        out.append(f"{self.MAGENTA}填空题:{self.NC}")
+        out.append(f"{self.BLUE}原文:{self.NC}\n{self.WHITE}{mark(q.get('content', ''))}{self.NC}\n")
+        out.append(f"{self.YELLOW}填空答案:{self.NC}")
         for i, ans in enumerate(q.get('answers', []), 1):
-            print(f"{self.CYAN}空 {i} (题号{ans.get('number', '')}):{self.NC} {ans.get('value', '')}")
-        print()
+            out.append(f"{self.CYAN}空 {i} (题号{ans.get('number', '')}):{self.NC} {mark(ans.get('value', ''))}")
+        out.append("")
 
-    def _print_picture(self, q):
+    def _print_picture(self, q, out, mark):
         topic = q.get('topic', '')
         content = q.get('content', '')
         keypoint = q.get('keypoint', '')
-        print(f"{self.ORANGE}主题: {topic}{self.NC}")
-        print(f"{self.BLUE}内容:{self.NC}\n{self.WHITE}{content}{self.NC}\n")
+        out.append(f"{self.ORANGE}主题: {mark(topic)}{self.NC}")
+        out.append(f"{self.BLUE}内容:{self.NC}\n{self.WHITE}{mark(content)}{self.NC}\n")
         if keypoint:
-            print(f"{self.YELLOW}关键点:{self.NC}\n{self.WHITE}{keypoint}{self.NC}\n")
-        print()
+            out.append(f"{self.YELLOW}关键点:{self.NC}\n{self.WHITE}{mark(keypoint)}{self.NC}\n")
+        out.append("")
+
+    def _highlighter(self, item, patterns):
+        # 在这条记录的检索字段里找出命中区间（和索引一样先做大小写折叠），返回给字段值加高亮的函数。
+        # 只对要显示的记录算；折叠后长度变了的字段（比如 ß）位置对不上，不高亮
+        spans = {}
+        for field, text in self._search_fields(item):
+            folded = text.casefold()
+            if len(folded) != len(text):
+                continue
+            found = [m.span() for fields, pattern in patterns if fields is None or field in fields
+                     for m in pattern.finditer(folded) if m.end() > m.start()]
+            if found:
+                spans.setdefault(text, []).extend(found)
+        if not spans:
+            return _原样
+
+        def mark(value):
+            found = spans.get(value) if isinstance(value, str) else None
+            if not found:
+                return value
+            parts = []
+            pos = 0
+            for start, end in sorted(found):
+                start = max(start, pos)
+                if end <= start:
+                    continue
+                parts.append(value[pos:start])
+                parts.append(f"{self.HIGHLIGHT}{value[start:end]}{self.HIGHLIGHT_END}")
+                pos = end
+            parts.append(value[pos:])
+            return ''.join(parts)
+        return mark
 
     # 搜索功能
 
+    def _build_index(self):
+        # 载入题目后建立倒排索引，GUI 的 HTML 缓存和查询缓存跟着作废
+        with self._lock, self.stats.phase('index'):
+            self.index = 搜索索引(self.all_data, self._search_fields)
+            self._html_cache = {}
+            self._query_cache.clear()
+        with self._lock, self.stats.phase('similar_index'):
+            self._similar = 相似索引(self.all_data)
+
+    def _load_index(self):
+        # 启动时用：源文件和题目顺序都没变时直接读回上次保存的启动索引，否则重建并保存。
+        # 监视模式下 _apply_changes 的重建只在内存里，题目顺序和完整启动时不同，不写文件
+        digest = self._index_digest() if self.use_cache else None
+        if digest is not None and self._load_startup_index(digest):
+            return
+        self._build_index()
+        if digest is not None:
+            with self._lock, self.stats.phase('index_save'):
+                self._save_startup_index(digest)
+
+    def _startup_index_file(self):
+        # 启动索引和解析缓存放在一起
+        return self.root_dir.parent / f".{self.root_dir.name}.fucketsindex"
+
+    def _index_digest(self):
+        # 源文件签名、题目顺序（按 all_data 顺序拼起来的内容指纹）和影响索引内容的设置，都一样时才能直接用；
+        # 刚解析完时 _by_fingerprint 的插入顺序就是 all_data 的顺序，不是时不用启动索引
+        if list(self._by_fingerprint.values()) != self.all_data:
+            return None
+        order = hashlib.blake2b(b''.join(self._by_fingerprint), digest_size=16).hexdigest()
+        key = [INDEX_FORMAT_VERSION, CACHE_VERSION, GRAM_SIZE, SHINGLE_SIZE, SIMILAR_NUM_PERM, SIMILAR_BANDS,
+               repr(SEARCH_FIELDS), repr(FIELD_WEIGHTS), str(self.root_dir), list(self._unit_sigs.items()), order]
+        return hashlib.blake2b(json.dumps(key, ensure_ascii=False).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _load_startup_index(self, digest):
+        # 读回启动索引，文件不存在、过期或损坏时返回 False
+        path = self._startup_index_file()
+        try:
+            with self.stats.phase('index_load'):
+                data = path.read_bytes()
+                sections, meta = _索引分段(data, path)
+                if meta.get('digest') != digest:
+                    return False
+
+                def raw(name):
+                    offset, size = sections[name]
+                    return data[offset:offset + size]
+
+                index = 搜索索引.载入(raw, meta, self.all_data, self._search_fields)
+                similar = 相似索引.载入(raw, self.all_data)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{self.YELLOW}⚠️  启动索引不可用，重新建立（{path}）: {e}{self.NC}")
+            return False
+        with self._lock:
+            self.index = index
+            self._similar = similar
+            self._html_cache = {}
+            self._query_cache.clear()
+        return True
+
+    def _save_startup_index(self, digest):
+        path = self._startup_index_file()
+        try:
+            self.index.save(path, {'digest': digest}, self._similar, with_records=False)
+        except Exception as e:
+            print(f"{self.YELLOW}⚠️  写入启动索引失败（{path}）: {e}{self.NC}")
+
+    def _search_fields(self, item):
+        # 按题型字段表列出 (字段, 文本)，建索引时算一次，查询时直接用
+        parts = []
+        for field in SEARCH_FIELDS.get(item['type'], ()):
+            value = item.get(field)
+            if isinstance(value, str):
+                parts.append((field, value))
+            elif isinstance(value, (list, tuple)):
+                for sub in value:
+                    if isinstance(sub, dict):
+                        sub = sub.get('value', '')
+                    if isinstance(sub, str):
+                        parts.append((field, sub))
+        return parts
+
+    def _match(self, keyword):
+        # CLI 和 GUI 共用的匹配逻辑，按语料顺序返回命中的记录
+        if keyword.startswith(QUERY_PREFIX):
+            return self._query(keyword[len(QUERY_PREFIX):])
+        k = keyword.casefold()
+        if self.sqlite_backend is not None:
+            return self._sqlite_match(keyword, k)
+        start = time.perf_counter()
+        with self._lock:
+            index = self.index
+            cache = self._query_cache
+            ids = cache.get(k)
+            if ids is not None:
+                self.stats.count('query_cache', '命中')
+            else:
+                # 有包含在 k 里的旧查询时只检查它的结果，否则用索引求候选
+                base = cache.narrowest(k)
+                if base is not None:
+                    self.stats.count('query_cache', '缩小')
+                else:
+                    self.stats.count('query_cache', '未命中')
+                    base = index.candidates(k)
+                    if base is None:
+                        base = range(len(index.records))
+                texts = index.texts
+                ids = tuple(i for i in base if k in texts[i])
+                cache.put(k, ids)
+            records = index.records
+            results = [records[i] for i in ids]
+        self.stats.record_query('match', keyword, time.perf_counter() - start, len(results))
+        return results
+
+    def find_similar(self, query, k=SIMILAR_TOP_K):
+        # 和 query（一条记录或一段文字）最相似的 k 条记录 [(相似度, 记录)]，按对话 / 文章原文比较；
+        # query 是记录时结果里不包含它自己
+        text = query if isinstance(query, str) else 相似文本(query)
+        exclude = None if isinstance(query, str) else query
+        start = time.perf_counter()
+        with self._lock:
+            if self._similar is None:
+                with self.stats.phase('similar_index'):
+                    self._similar = 相似索引(item for item in self.all_data if item is not None)
+            index = self._similar
+            signature = MinHash签名(相似特征(text))
+            results = [] if signature is None else \
+                [(score, index.records[rid]) for score, rid in index.query(signature, k, exclude)]
+        self.stats.record_query('similar', text[:60], time.perf_counter() - start, len(results))
+        return results
+
+    def _sqlite_match(self, keyword, k):
+        # 用 FTS5 查询，结果换成内存里的记录并按语料顺序排好，和内存扫描的顺序一致
+        start = time.perf_counter()
+        with self._lock:
+            items = self._sqlite_items
+            rids = self.index._rids
+            results = sorted((items[rid] for rid in self.sqlite_backend.search(k)), key=rids.__getitem__)
+        self.stats.record_query('sqlite', keyword, time.perf_counter() - start, len(results))
+        return results
+
+    def _query(self, text):
+        # 查询语言：先用索引求出候选，再按条件逐条检查，结果按语料顺序返回
+        plan = 解析查询(text)
+        start = time.perf_counter()
+        key = QUERY_PREFIX + text.strip()
+        with self._lock:
+            index = self.index
+            # 查询语言的结果只按原文缓存，不做缩小
+            rids = self._query_cache.get(key)
+            if rids is None:
+                ids = plan.candidates(index)
+                ids = range(len(index.records)) if ids is None else sorted(ids)
+                ctx = _查询上下文(index, self._search_fields)
+                live = index._live
+                rids = tuple(rid for rid in ids if live(rid) and plan.matches(ctx, rid))
+                self._query_cache.put(key, rids)
+            records = index.records
+            results = [records[rid] for rid in rids]
+        self.stats.record_query('query', text, time.perf_counter() - start, len(results))
+        return results
+
+    def ranked_search(self, query, k=RANKED_TOP_K):
+        # 排序搜索，返回得分最高的 k 条 [(得分, 记录)]
+        start = time.perf_counter()
+        with self._lock:
+            records = self.index.records
+            results = [(score, records[rid]) for score, rid in self.index.rank(query, k)]
+        self.stats.record_query('rank', query, time.perf_counter() - start, len(results))
+        return results
+
+    def _print_item(self, item, out=None, mark=None):
+        # 按题型打印，同一题出现在多份试卷时先提示来源数；不传 out 时直接写到终端
+        buffered = out is not None
+        if not buffered:
+            out = []
+        count = _来源数(item)
+        if count > 1:
+            out.append(f"{self.BLUE}📚 出现在 {count} 份试卷中{self.NC}")
+        self._printer(item)(item, out, mark or _原样)
+        if not buffered:
+            self._write(out)
+
+    def _write(self, out):
+        # 整页内容一次写出，Termux 等终端上逐行 print 很慢
+        sys.stdout.write('\n'.join(out) + '\n')
+        sys.stdout.flush()
+
+    def _show_more(self, remaining):
+        # 还有结果没显示时询问是否继续，返回这次要显示的条数（0 表示不再显示）
+        if not sys.stdin.isatty():
+            return remaining
+        try:
+            answer = input(f"{self.YELLOW}还有 {remaining} 条结果，回车显示下 {min(remaining, CONSOLE_PAGE_SIZE)} 条，"
+                           f"a 显示全部，q 返回: {self.NC}").strip().lower()
+        except EOFError:
+            return 0
+        if answer in ('q', '/exit'):
+            return 0
+        return remaining if answer == 'a' else CONSOLE_PAGE_SIZE
+
+    def _printer(self, item):
+        return {
+            'choose': self._print_choose,
+            'dialogue': self._print_dialogue,
+            'read': self._print_read,
+            'fill': self._print_fill,
+            'picture': self._print_picture,
+        }[item['type']]
+
+    def search_questions_ranked(self, query, k=RANKED_TOP_K):
+        results = self.ranked_search(query, k)
+        if not results:
+            print(f"{self.RED}❌ 未找到和 \"{query}\" 相关的题目。{self.NC}")
+            return
+        self._last_results = [item for _, item in results]
+        out = []
+        for n, (score, item) in enumerate(results, 1):
+            out.append(f"{self.PURPLE}#{n}  相关度 {score:.2f}{self.NC}")
+            self._print_item(item, out)
+        self._write(out)
+
+    def search_questions_similar(self, text, k=SIMILAR_TOP_K):
+        # "#n" 表示上一次显示的第 n 条结果，其它按粘贴的文字查找
+        m = re.fullmatch(r'#(\d+)', text)
+        if m:
+            n = int(m.group(1))
+            if not 1 <= n <= len(self._last_results):
+                print(f"{self.YELLOW}⚠️  上一次结果里没有第 {n} 条{self.NC}")
+                return
+            text = self._last_results[n - 1]
+        results = self.find_similar(text, k)
+        if not results:
+            print(f"{self.RED}❌ 没有找到相似的题目（只比较对话和文章原文）。{self.NC}")
+            return
+        self._last_results = [item for _, item in results]
+        out = []
+        for n, (score, item) in enumerate(results, 1):
+            out.append(f"{self.PURPLE}#{n}  相似度 {score:.2f}{self.NC}")
+            self._print_item(item, out)
+        self._write(out)
+
     def search_questions(self, keyword):
-        found = False
-        k = keyword.lower()
-        for item in self.all_data:
-            match = False
-            if item['type'] == 'choose':
-                if (k in item.get('question', '').lower() or
-                    k in item.get('dialogue', '').lower() or
-                    k in item.get('analyze', '').lower()):
-                    match = True
-            elif item['type'] == 'dialogue':
-                if (k in item.get('question', '').lower() or
-                    k in item.get('listening_text', '').lower() or
-                    any(k in ans.lower() for ans in item.get('standard_answers', [])) or
-                    k in item.get('keywords', '').lower()):
-                    match = True
-            elif item['type'] in ['read', 'fill', 'picture']:
-                # 把所有文本字段拼起来搜索
-                text_parts = []
-                for v in item.values():
-                    if isinstance(v, str):
-                        text_parts.append(v)
-                    elif isinstance(v, list):
-                        for sub in v:
-                            if isinstance(sub, dict):
-                                text_parts.extend(str(val) for val in sub.values() if isinstance(val, str))
-                            elif isinstance(sub, str):
-                                text_parts.append(sub)
-                full_text = ' '.join(text_parts)
-                if k in full_text.lower():
-                    match = True
-            if match:
-                found = True
-                if item['type'] == 'choose':
-                    self._print_choose(item)
-                elif item['type'] == 'dialogue':
-                    self._print_dialogue(item)
-                elif item['type'] == 'read':
-                    self._print_read(item)
-                elif item['type'] == 'fill':
-                    self._print_fill(item)
-                elif item['type'] == 'picture':
-                    self._print_picture(item)
-        if not found:
+        # 结果分页显示，每页渲染好后一次写出；命中的内容高亮
+        results = self._match(keyword)
+        if not results:
             print(f"{self.RED}❌ 未找到包含 \"{keyword}\" 的题目。{self.NC}")
+            return
+        self._last_results = results
+        patterns = 高亮模式(keyword)
+        shown = 0
+        count = CONSOLE_PAGE_SIZE
+        while count:
+            out = []
+            page = results[shown:shown + count]
+            for item in page:
+                self._print_item(item, out, self._highlighter(item, patterns))
+            shown += len(page)
+            if shown >= len(results):
+                out.append(f"{self.CYAN}共 {len(results)} 条结果{self.NC}")
+                self._write(out)
+                break
+            self._write(out)
+            count = self._show_more(len(results) - shown)
 
     def interactive_mode(self):
         total = len(self.all_data)
@@ -441,13 +2821,35 @@ class ETS数据提取器:
             print(f"{self.RED}❌ 未在目录 {self.root_dir} 中找到任何题目数据！{self.NC}")
             return
         print(f"{self.GREEN}✅ 成功加载 {total} 条题目！{self.NC}")
-        print(f"{self.CYAN}🔍 输入关键词搜索题目，输入 {self.RED}/exit{self.CYAN} 退出。{self.NC}\n")
+        print(f"{self.CYAN}🔍 输入关键词搜索题目，输入 {self.RED}/exit{self.CYAN} 退出。{self.NC}")
+        print(f"{self.CYAN}   输入 {self.PURPLE}/rank 关键词{self.CYAN} 按相关度排序，只显示前 {RANKED_TOP_K} 条，可容错拼写。{self.NC}")
+        print(f"{self.CYAN}   以 {self.PURPLE}?{self.CYAN} 开头使用查询语言，如 {self.PURPLE}?weekend -ticket type:choose{self.CYAN}、"
+              f"{self.PURPLE}?\"good morning\" OR answer:/libr.ry/{self.NC}")
+        print(f"{self.CYAN}   输入 {self.PURPLE}/similar 一段原文{self.CYAN} 查找改写过的相似对话 / 文章，"
+              f"{self.PURPLE}/similar #n{self.CYAN} 查找和上一次结果第 n 条相似的题目。{self.NC}\n")
         while True:
             try:
                 user_input = input("请输入: ").strip()
                 if user_input.lower() in ['/exit', 'quit', 'q']:
                     print(f"{self.GREEN}再见！{self.NC}")
                     break
+                elif user_input.lower() == '/stats':
+                    if self.stats.enabled:
+                        self.print_stats()
+                    else:
+                        print(f"{self.YELLOW}⚠️  统计未开启，启动时加上 --stats{self.NC}")
+                elif user_input.startswith('/similar'):
+                    text = user_input[len('/similar'):].strip()
+                    if text:
+                        self.search_questions_similar(text)
+                    else:
+                        print(f"{self.YELLOW}⚠️  用法: /similar 一段原文 或 /similar #n{self.NC}")
+                elif user_input.startswith('/rank'):
+                    query = user_input[len('/rank'):].strip()
+                    if query:
+                        self.search_questions_ranked(query)
+                    else:
+                        print(f"{self.YELLOW}⚠️  用法: /rank 关键词{self.NC}")
                 elif user_input:
                     self.search_questions(user_input)
                 else:
@@ -463,118 +2865,358 @@ class ETS数据提取器:
             except Exception as e:
                 print(f"{self.RED}❌ 错误: {e}{self.NC}")
 
+    def json_row(self, item, score=None):
+        # 批量模式和守护进程共用的结果格式
+        fields = item.to_dict()
+        row = {'type': fields.pop('type')}
+        if score is not None:
+            row['score'] = round(score, 4)
+        row['fields'] = fields
+        row['sources'] = [{'directory': directory, 'audio': audio} for directory, audio in item.sources]
+        return row
+
+    def batch_mode(self, lines, out=None):
+        # 批量查询：每行一个关键词（"/rank 关键词" 按相关度，"/similar 原文" 找相似题），每条命中输出一行 JSON
+        # 每个查询的结果写完就 flush，下游可以边读边处理；返回 (查询数, 命中数)
+        out = out or sys.stdout
+        queries = hits = 0
+        for line in lines:
+            query = line.strip()
+            if not query:
+                continue
+            queries += 1
+            try:
+                if query.startswith('/rank'):
+                    query = query[len('/rank'):].strip()
+                    results = self.ranked_search(query)
+                elif query.startswith('/similar'):
+                    query = query[len('/similar'):].strip()
+                    results = self.find_similar(query)
+                else:
+                    results = [(None, item) for item in self._match(query)]
+            except Exception as e:
+                print(f"{self.RED}❌ 查询失败（{query}）: {e}{self.NC}", file=sys.stderr)
+                continue
+            for n, (score, item) in enumerate(results, 1):
+                row = {'query': query}
+                if score is not None:
+                    row['rank'] = n
+                row.update(self.json_row(item, score))
+                out.write(json.dumps(row, ensure_ascii=False) + '\n')
+            out.flush()
+            hits += len(results)
+        return queries, hits
+
     # -----------GUI相关的搜索方法
     
     def search_questions_for_gui(self, keyword):
-        # 返回给GUI的搜索结果
-        results = []
-        k = keyword.lower()
-        for item in self.all_data:
-            match = False
-            if item['type'] == 'choose':
-                if (k in item.get('question', '').lower() or
-                    k in item.get('dialogue', '').lower() or
-                    k in item.get('analyze', '').lower()):
-                    match = True
-            elif item['type'] == 'dialogue':
-                if (k in item.get('question', '').lower() or
-                    k in item.get('listening_text', '').lower() or
-                    any(k in ans.lower() for ans in item.get('standard_answers', [])) or
-                    k in item.get('keywords', '').lower()):
-                    match = True
-            elif item['type'] in ['read', 'fill', 'picture']:
-                text_parts = []
-                for v in item.values():
-                    if isinstance(v, str):
-                        text_parts.append(v)
-                    elif isinstance(v, list):
-                        for sub in v:
-                            if isinstance(sub, dict):
-                                text_parts.extend(str(val) for val in sub.values() if isinstance(val, str))
-                            elif isinstance(sub, str):
-                                text_parts.append(sub)
-                full_text = ' '.join(text_parts)
-                if k in full_text.lower():
-                    match = True
-            if match:
-                results.append(item)
-        return results
+        # 返回给GUI的搜索结果，查询语言还没输完整时先不显示结果；~ 开头时找相似题
+        if keyword.startswith(SIMILAR_PREFIX):
+            text = keyword[len(SIMILAR_PREFIX):].strip()
+            return [item for _, item in self.find_similar(text)] if text else []
+        try:
+            return self._match(keyword)
+        except 查询语法错误:
+            return []
 
     def format_item_for_gui(self, item):
-        # 转成HTML格式给GUI显示
+        # 转成HTML格式给GUI显示，每条记录只渲染一次
+        html = self._html_cache.get(item)
+        if html is None:
+            html = self._render_item_html(item)
+            self._html_cache[item] = html
+        return html
+
+    def _sources_html(self, item):
+        count = _来源数(item)
+        if count <= 1:
+            return ""
+        return f"<div style='color: #6c757d; font-size: 12px; margin-bottom: 8px;'>出现在 {count} 份试卷中</div>"
+
+    def _render_item_html(self, item):
         if item['type'] == 'choose':
-            html = "<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>"
+            html = ["<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>", self._sources_html(item)]
             if item.get('dialogue'):
-                html += f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>对话原文:</div>"
-                html += f"<div style='color: #495057; margin-bottom: 12px;'>{item['dialogue']}</div>"
-            html += f"<div style='color: #0dcaf0; font-weight: bold; margin-bottom: 8px;'>题目 {item.get('id', '')}:</div>"
-            html += f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('question', '')}</div>"
-            html += f"<div style='color: #198754; font-weight: bold; margin-bottom: 8px;'>正确答案: {item.get('answer', '')}</div>"
-            html += f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>选项:</div>"
+                html.append(f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>对话原文:</div>")
+                html.append(f"<div style='color: #495057; margin-bottom: 12px;'>{item['dialogue']}</div>")
+            html.append(f"<div style='color: #0dcaf0; font-weight: bold; margin-bottom: 8px;'>题目 {item.get('id', '')}:</div>")
+            html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('question', '')}</div>")
+            html.append(f"<div style='color: #198754; font-weight: bold; margin-bottom: 8px;'>正确答案: {item.get('answer', '')}</div>")
+            html.append(f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>选项:</div>")
             for opt in item.get('options', []):
-                html += f"<div style='color: #6c757d; margin-left: 20px; margin-bottom: 4px;'>{opt}</div>"
-            html += "</div>"
-            return html
+                html.append(f"<div style='color: #6c757d; margin-left: 20px; margin-bottom: 4px;'>{opt}</div>")
+            html.append("</div>")
+            return ''.join(html)
             
         elif item['type'] == 'dialogue':
-            html = "<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>"
-            html += f"<div style='color: #0dcaf0; font-weight: bold; margin-bottom: 8px;'>问题 {item.get('id', '')}:</div>"
-            html += f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('question', '')}</div>"
+            html = ["<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>", self._sources_html(item)]
+            html.append(f"<div style='color: #0dcaf0; font-weight: bold; margin-bottom: 8px;'>问题 {item.get('id', '')}:</div>")
+            html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('question', '')}</div>")
             if item.get('listening_text'):
-                html += f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>听力原文:</div>"
-                html += f"<div style='color: #495057; margin-bottom: 12px;'>{item.get('listening_text', '')}</div>"
+                html.append(f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>听力原文:</div>")
+                html.append(f"<div style='color: #495057; margin-bottom: 12px;'>{item.get('listening_text', '')}</div>")
             if item.get('standard_answers'):
-                html += f"<div style='color: #198754; font-weight: bold; margin-bottom: 8px;'>标准答案:</div>"
-                html += f"<div style='color: #212529; margin-bottom: 12px;'>{'; '.join(item['standard_answers'])}</div>"
+                html.append(f"<div style='color: #198754; font-weight: bold; margin-bottom: 8px;'>标准答案:</div>")
+                html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{'; '.join(item['standard_answers'])}</div>")
             if item.get('keywords'):
-                html += f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>关键词:</div>"
-                html += f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('keywords', '')}</div>"
-            html += "</div>"
-            return html
+                html.append(f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>关键词:</div>")
+                html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('keywords', '')}</div>")
+            html.append("</div>")
+            return ''.join(html)
             
         elif item['type'] == 'read':
-            html = "<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>"
-            html += f"<div style='color: #fd7e14; font-weight: bold; margin-bottom: 8px;'>阅读内容:</div>"
-            html += f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('content', '')}</div>"
-            html += "</div>"
-            return html
+            html = ["<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>", self._sources_html(item)]
+            html.append(f"<div style='color: #fd7e14; font-weight: bold; margin-bottom: 8px;'>阅读内容:</div>")
+            html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('content', '')}</div>")
+            html.append("</div>")
+            return ''.join(html)
             
         elif item['type'] == 'fill':
-            html = "<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>"
-            html += f"<div style='color: #d63384; font-weight: bold; margin-bottom: 8px;'>填空题:</div>"
-            html += f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>原文:</div>"
-            html += f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('content', '')}</div>"
-            html += f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>填空答案:</div>"
+            html = ["<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>", self._sources_html(item)]
+            html.append(f"<div style='color: #d63384; font-weight: bold; margin-bottom: 8px;'>填空题:</div>")
+            html.append(f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>原文:</div>")
+            html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{item.get('content', '')}</div>")
+            html.append(f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>填空答案:</div>")
             for i, ans in enumerate(item.get('answers', []), 1):
-                html += f"<div style='color: #0dcaf0; margin-left: 20px; margin-bottom: 4px;'>空 {i} (题号{ans.get('number', '')}): {ans.get('value', '')}</div>"
-            html += "</div>"
-            return html
+                html.append(f"<div style='color: #0dcaf0; margin-left: 20px; margin-bottom: 4px;'>空 {i} (题号{ans.get('number', '')}): {ans.get('value', '')}</div>")
+            html.append("</div>")
+            return ''.join(html)
             
         elif item['type'] == 'picture':
-            html = "<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>"
+            html = ["<div style='margin-bottom: 20px; padding: 15px; background-color: #f8f9fa; border-radius: 8px;'>", self._sources_html(item)]
             topic = item.get('topic', '')
             content = item.get('content', '')
             keypoint = item.get('keypoint', '')
             if topic:
-                html += f"<div style='color: #fd7e14; font-weight: bold; margin-bottom: 8px;'>主题: {topic}</div>"
-            html += f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>内容:</div>"
-            html += f"<div style='color: #212529; margin-bottom: 12px;'>{content}</div>"
+                html.append(f"<div style='color: #fd7e14; font-weight: bold; margin-bottom: 8px;'>主题: {topic}</div>")
+            html.append(f"<div style='color: #0d6efd; font-weight: bold; margin-bottom: 8px;'>内容:</div>")
+            html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{content}</div>")
             if keypoint:
-                html += f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>关键点:</div>"
-                html += f"<div style='color: #212529; margin-bottom: 12px;'>{keypoint}</div>"
-            html += "</div>"
-            return html
+                html.append(f"<div style='color: #ffc107; font-weight: bold; margin-bottom: 8px;'>关键点:</div>")
+                html.append(f"<div style='color: #212529; margin-bottom: 12px;'>{keypoint}</div>")
+            html.append("</div>")
+            return ''.join(html)
         
         return ""
 
-# 自定义悬浮窗 - 只在Windows系统且PyQt5可用时定义
-if is_win and PYQT_AVAILABLE:
+# GUI 边输入边搜索的防抖延迟（毫秒）
+SEARCH_DEBOUNCE_MS = 250
+# GUI 结果每页条数，以及滚动条离底部多少像素时加载下一页
+GUI_PAGE_SIZE = 30
+GUI_LOAD_MORE_MARGIN = 200
+
+class 多题库提取器(ETS数据提取器):
+    # 同时打开多个题库目录，每个目录是一个独立的分片（自己的缓存、索引和监视线程），
+    # 查询并行分发到各分片后按分片顺序合并；单个分片可以单独重新加载，不影响其它分片
+    def __init__(self, roots, use_cache=True, jobs=1, stats=False):
+        import concurrent.futures
+        self.shards = []
+        self.setup_colors()
+        for root in roots:
+            print(f"{self.PURPLE}📁 题库 {len(self.shards) + 1}/{len(roots)}: {root}{self.NC}")
+            self.shards.append(ETS数据提取器(root, use_cache=use_cache, jobs=jobs, stats=stats))
+        self.root_dir = os.pathsep.join(str(shard.root_dir) for shard in self.shards)
+        self.all_data = _合并序列(self.shards)
+        self.stats = 运行统计(stats)
+        self._lock = threading.RLock()
+        self._html_cache = {}
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(self.shards),
+                                                           thread_name_prefix='ets-shard')
+
+    def _fan_out(self, func):
+        # 在每个分片上并行执行 func(分片)，结果按分片顺序返回
+        if len(self.shards) == 1:
+            return [func(self.shards[0])]
+        return list(self._pool.map(func, self.shards))
+
+    def _match(self, keyword):
+        start = time.perf_counter()
+        results = [item for part in self._fan_out(lambda shard: shard._match(keyword)) for item in part]
+        self.stats.record_query('match', keyword, time.perf_counter() - start, len(results))
+        return results
+
+    def ranked_search(self, query, k=RANKED_TOP_K):
+        # 各分片各取前 k 条再合并；得分用各分片自己的词频统计，分片之间只是近似可比
+        start = time.perf_counter()
+        parts = self._fan_out(lambda shard: shard.ranked_search(query, k))
+        merged = [(score, n, item) for n, part in enumerate(parts) for score, item in part]
+        results = [(score, item) for score, _, item in
+                   heapq.nlargest(k, merged, key=lambda entry: (entry[0], -entry[1]))]
+        self.stats.record_query('rank', query, time.perf_counter() - start, len(results))
+        return results
+
+    def find_similar(self, query, k=SIMILAR_TOP_K):
+        # 各分片各取前 k 条再按相似度合并，相似度在分片之间可以直接比较
+        start = time.perf_counter()
+        parts = self._fan_out(lambda shard: shard.find_similar(query, k))
+        merged = [(score, n, item) for n, part in enumerate(parts) for score, item in part]
+        results = [(score, item) for score, _, item in
+                   heapq.nlargest(k, merged, key=lambda entry: (entry[0], -entry[1]))]
+        self.stats.record_query('similar', (query if isinstance(query, str) else 相似文本(query))[:60],
+                                time.perf_counter() - start, len(results))
+        return results
+
+    def format_item_for_gui(self, item):
+        # 交给记录所在的分片渲染，分片增量更新时会清掉自己的 HTML 缓存
+        for shard in self.shards:
+            if item in shard.index._rids:
+                return shard.format_item_for_gui(item)
+        # 二进制索引打开的分片是只读的，缓存在这里就行
+        return super().format_item_for_gui(item)
+
+    def refresh(self):
+        # 检查所有分片，返回合计的 (更新的文件数, 删除的文件数)
+        updated = removed = 0
+        for shard_updated, shard_removed in self._fan_out(lambda shard: shard.refresh()):
+            updated += shard_updated
+            removed += shard_removed
+        return updated, removed
+
+    def reload_shard(self, n):
+        # 只重新检查第 n 个分片（从 0 开始）
+        return self.shards[n].refresh()
+
+    def start_watch(self, interval=WATCH_INTERVAL):
+        # 每个分片各自一个监视线程，互不等待
+        return [shard.start_watch(interval) for shard in self.shards]
+
+    def stop_watch(self):
+        for shard in self.shards:
+            shard.stop_watch()
+
+    def export_index(self, path):
+        raise TypeError("多个题库不能导出到同一个索引文件，请分别导出")
+
+    def export_sqlite(self, path):
+        raise TypeError("多个题库不能导出到同一个 SQLite 文件，请分别导出")
+
+    def use_sqlite(self, path=None):
+        # 每个分片用自己目录旁边的数据库
+        if path is not None:
+            raise TypeError("多个题库各自使用默认位置的 SQLite 文件，不能指定同一个文件")
+        for shard in self.shards:
+            shard.use_sqlite()
+
+    def verify_assets(self):
+        return [(f"[{shard.root_dir}] {key}", name, problem)
+                for shard in self.shards for key, name, problem in shard.verify_assets()]
+
+    def print_stats(self):
+        for n, shard in enumerate(self.shards, 1):
+            print(f"{self.PURPLE}📁 题库 {n}: {shard.root_dir}{self.NC}")
+            shard.print_stats()
+        if self.stats.query_count:
+            print(f"{self.PURPLE}📁 合并查询{self.NC}")
+            print(self.stats.report(self))
+
+class _合并序列:
+    # 把各分片的 all_data 串起来的只读视图，不复制记录
+    def __init__(self, shards):
+        self._shards = shards
+
+    def __len__(self):
+        return sum(len(shard.all_data) for shard in self._shards)
+
+    def __iter__(self):
+        for shard in self._shards:
+            yield from shard.all_data
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        for shard in self._shards:
+            if i < len(shard.all_data):
+                return shard.all_data[i]
+            i -= len(shard.all_data)
+        raise IndexError(i)
+
+# 子进程里复用的解析器
+_工作解析器 = None
+
+def _并行解析(unit, with_stats=False):
+    # 进程池的任务函数，必须在模块顶层才能被pickle
+    # 返回 ((记录, 素材大小), 这次解析的统计)
+    global _工作解析器
+    if _工作解析器 is None:
+        _工作解析器 = ETS数据提取器._解析器实例(stats=with_stats)
+    # 不同文件的素材目录不会重复，目录列表用完就丢
+    _工作解析器._listings = {}
+    result = _工作解析器._parse_unit(*unit)
+    return result, _工作解析器.stats.take() if with_stats else None
+
+# 加载GUI() 的结果，第一次调用后缓存
+_GUI类 = None
+
+def 加载GUI():
+    # 导入 PyQt5 并定义悬浮窗相关的类，返回 (QApplication, 自定义悬浮窗)
+    # 只在用户选择 GUI 模式后调用，控制台模式完全不会导入 PyQt5
+    global _GUI类
+    if _GUI类 is not None:
+        return _GUI类
+    from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
+                                QLineEdit, QPushButton, QTextEdit)
+    from PyQt5.QtCore import Qt, QPoint, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+    from PyQt5.QtGui import QFont, QTextCursor
+
+    class 搜索信号(QObject):
+        # 后台搜索完成后通知界面线程：(请求序号, 关键词, (全部结果, 第一页HTML))
+        finished = pyqtSignal(int, str, object)
+        # 搜索或渲染出错：(请求序号, 关键词, 错误信息)
+        failed = pyqtSignal(int, str, str)
+
+    class 搜索任务(QRunnable):
+        # 在线程池里执行搜索和HTML拼接，不占用界面线程
+        def __init__(self, extractor, seq, keyword, latest_seq):
+            super().__init__()
+            self.extractor = extractor
+            self.seq = seq
+            self.keyword = keyword
+            # 返回最新请求序号的函数，用来判断这次搜索是否已经过时
+            self.latest_seq = latest_seq
+            self.signals = 搜索信号()
+
+        def is_stale(self):
+            return self.seq != self.latest_seq()
+
+        def run(self):
+            if self.is_stale():
+                return
+            try:
+                results = self.extractor.search_questions_for_gui(self.keyword)
+                # 只渲染第一页，剩下的滚动到底部时再渲染；每条渲染前检查一次，过时了就不再继续
+                parts = []
+                for item in results[:GUI_PAGE_SIZE]:
+                    if self.is_stale():
+                        return
+                    parts.append(self.extractor.format_item_for_gui(item))
+            except Exception as e:
+                # 线程池里的异常不会传到界面线程，要发信号告诉界面，否则结果区一直停在旧内容
+                if not self.is_stale():
+                    self.signals.failed.emit(self.seq, self.keyword, str(e))
+                return
+            if self.is_stale():
+                return
+            self.signals.finished.emit(self.seq, self.keyword, (results, ''.join(parts)))
+
     class 自定义悬浮窗(QMainWindow):
         def __init__(self, extractor):
             super().__init__()
             self.extractor = extractor
             self.dragging = False
             self.drag_position = QPoint()
+            # 每次发起搜索序号加一，过时的结果直接丢弃
+            self.search_seq = 0
+            # 当前结果和已经显示的条数，滚动时分页追加
+            self.current_results = []
+            self.shown_count = 0
+            # 单线程的搜索池，排队中的过时任务会很快跳过
+            self.search_pool = QThreadPool(self)
+            self.search_pool.setMaxThreadCount(1)
+            # 输入停顿一段时间后再搜索
+            self.debounce_timer = QTimer(self)
+            self.debounce_timer.setSingleShot(True)
+            self.debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+            self.debounce_timer.timeout.connect(self.perform_search)
             self.initUI()
             
         def initUI(self):
@@ -600,7 +3242,7 @@ if is_win and PYQT_AVAILABLE:
             
             # 搜索输入框
             self.search_input = QLineEdit()
-            self.search_input.setPlaceholderText("输入关键词搜索题目...")
+            self.search_input.setPlaceholderText("输入关键词搜索题目，~ 开头粘贴原文找相似题...")
             self.search_input.setFixedHeight(40)
             self.search_input.setStyleSheet("""
                 QLineEdit {
@@ -678,6 +3320,8 @@ if is_win and PYQT_AVAILABLE:
                 }
             """)
             self.result_display.setHtml("<div style='color: #6c757d; text-align: center; padding: 20px;'>请输入关键词开始搜索...</div>")
+            # 滚动到底部附近时加载下一页
+            self.result_display.verticalScrollBar().valueChanged.connect(self.on_scroll)
             
             # 添加到主布局
             main_layout.addLayout(top_layout)
@@ -697,22 +3341,68 @@ if is_win and PYQT_AVAILABLE:
             
             # 连接回车键事件
             self.search_input.returnPressed.connect(self.perform_search)
+            # 边输入边搜索
+            self.search_input.textChanged.connect(self.on_text_changed)
+
+        def on_text_changed(self, text):
+            # 输入变化时作废正在进行的搜索，等输入停顿后再搜
+            self.search_seq += 1
+            if not text.strip():
+                self.debounce_timer.stop()
+                self.show_message("<div style='color: #6c757d; text-align: center; padding: 20px;'>请输入关键词开始搜索...</div>")
+                return
+            self.debounce_timer.start()
             
         def perform_search(self):
+            self.debounce_timer.stop()
             keyword = self.search_input.text().strip()
             if not keyword:
-                self.result_display.setHtml("<div style='color: #dc3545; text-align: center; padding: 20px;'>请输入搜索关键词</div>")
+                self.show_message("<div style='color: #dc3545; text-align: center; padding: 20px;'>请输入搜索关键词</div>")
                 return
-                
-            results = self.extractor.search_questions_for_gui(keyword)
+
+            self.search_seq += 1
+            task = 搜索任务(self.extractor, self.search_seq, keyword, lambda: self.search_seq)
+            task.signals.finished.connect(self.show_results)
+            task.signals.failed.connect(self.show_error)
+            self.search_pool.start(task)
+
+        def show_error(self, seq, keyword, message):
+            if seq != self.search_seq:
+                return
+            self.show_message(f"<div style='color: #dc3545; text-align: center; padding: 20px;'>搜索 \"{html.escape(keyword)}\" 时出错: {html.escape(message)}</div>")
+
+        def show_results(self, seq, keyword, payload):
+            # 在界面线程里显示第一页，过时的结果直接丢弃
+            if seq != self.search_seq:
+                return
+            results, first_page = payload
             if not results:
-                self.result_display.setHtml(f"<div style='color: #dc3545; text-align: center; padding: 20px;'>未找到包含 \"{keyword}\" 的题目</div>")
+                self.show_message(f"<div style='color: #dc3545; text-align: center; padding: 20px;'>未找到包含 \"{keyword}\" 的题目</div>")
                 return
-                
-            html_content = ""
-            for item in results:
-                html_content += self.extractor.format_item_for_gui(item)
-            self.result_display.setHtml(html_content)
+            self.current_results = results
+            self.shown_count = min(len(results), GUI_PAGE_SIZE)
+            header = f"<div style='color: #6c757d; margin-bottom: 10px;'>共找到 {len(results)} 条结果</div>"
+            self.result_display.setHtml(header + first_page)
+            # 第一页不够一屏时直接补下一页
+            self.on_scroll(self.result_display.verticalScrollBar().value())
+
+        def show_message(self, html):
+            # 用提示替换结果区时先清空分页状态，否则 setHtml 重置滚动条触发的 on_scroll 会把旧结果追加到提示下面
+            self.current_results = []
+            self.shown_count = 0
+            self.result_display.setHtml(html)
+
+        def on_scroll(self, value):
+            bar = self.result_display.verticalScrollBar()
+            if self.shown_count >= len(self.current_results) or value < bar.maximum() - GUI_LOAD_MORE_MARGIN:
+                return
+            page = self.current_results[self.shown_count:self.shown_count + GUI_PAGE_SIZE]
+            self.shown_count += len(page)
+            html_content = ''.join(self.extractor.format_item_for_gui(item) for item in page)
+            # 追加到末尾，不重新设置整个文档，保持滚动位置
+            cursor = QTextCursor(self.result_display.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertHtml(html_content)
             
         def exit_program(self):
         # 退出程序
@@ -736,6 +3426,142 @@ if is_win and PYQT_AVAILABLE:
             # 绘制圆角背景（移除了自定义绘制，使用样式表实现）
             pass
 
+    _GUI类 = (QApplication, 自定义悬浮窗)
+    return _GUI类
+
+def 选择目录(default_path):
+    # 弹出目录选择框，用完就销毁 tk 根窗口；返回空字符串表示用户取消
+    import tkinter as tk
+    from tkinter import filedialog
+    root = tk.Tk()
+    # 隐藏tk主窗口
+    root.withdraw()
+    try:
+        return filedialog.askdirectory(parent=root, title="选择 ETS 题库目录", initialdir=default_path)
+    finally:
+        root.destroy()
+
+def 运行守护进程(extractor, port=DAEMON_PORT, host=DAEMON_HOST):
+    # 常驻内存，通过本机 HTTP 提供查询，协议是 JSON：
+    #   GET  /search?q=关键词[&rank=1][&limit=N]  -> {"query", "total", "results": [{"type", "fields", "score"?}]}
+    #   GET  /status                              -> 题目数、题库目录、启动时间
+    #   POST /reload                              -> 立即检查题库变化，返回 {"updated", "removed"}
+    # 每个连接一个线程，查询和后台更新靠 extractor._lock 互斥
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlsplit, parse_qs
+
+    started = time.time()
+
+    class 查询处理(BaseHTTPRequestHandler):
+        def _reply(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            if url.path == '/status':
+                self._reply(200, {'records': len(extractor.all_data), 'root': str(extractor.root_dir),
+                                  'uptime': round(time.time() - started, 1)})
+                return
+            if url.path != '/search':
+                self._reply(404, {'error': f'未知路径: {url.path}'})
+                return
+            query = params.get('q', '').strip()
+            if not query:
+                self._reply(400, {'error': '缺少参数 q'})
+                return
+            try:
+                # limit 小于 1 时按 1 处理，两种搜索一致
+                limit = max(1, int(params.get('limit', DAEMON_RESULT_LIMIT)))
+            except ValueError:
+                self._reply(400, {'error': 'limit 需要是整数'})
+                return
+            try:
+                if params.get('rank') in ('1', 'true'):
+                    results = extractor.ranked_search(query, min(limit, DAEMON_RESULT_LIMIT))
+                else:
+                    results = [(None, item) for item in extractor._match(query)]
+            except 查询语法错误 as e:
+                self._reply(400, {'error': f'查询语法错误: {e}'})
+                return
+            self._reply(200, {
+                'query': query,
+                'total': len(results),
+                'results': [extractor.json_row(item, score) for score, item in results[:limit]],
+            })
+
+        def do_POST(self):
+            if urlsplit(self.path).path != '/reload':
+                self._reply(404, {'error': f'未知路径: {self.path}'})
+                return
+            try:
+                updated, removed = extractor.refresh()
+            except Exception as e:
+                self._reply(500, {'error': str(e)})
+                return
+            self._reply(200, {'updated': updated, 'removed': removed, 'records': len(extractor.all_data)})
+
+        def log_message(self, format, *args):
+            # 不逐条打印访问日志
+            pass
+
+    server = ThreadingHTTPServer((host, port), 查询处理)
+    server.daemon_threads = True
+    print(f"{extractor.GREEN}🚀 守护进程已启动: http://{host}:{port}/ ，"
+          f"共 {len(extractor.all_data)} 条题目，Ctrl+C 退出{extractor.NC}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{extractor.GREEN}守护进程已退出。{extractor.NC}")
+    finally:
+        server.server_close()
+        extractor.stop_watch()
+
+def 守护进程查询(query, port=DAEMON_PORT, host=DAEMON_HOST):
+    # 轻量客户端：不扫描题库，把查询发给守护进程后按控制台格式打印，返回退出码
+    from urllib.error import HTTPError, URLError
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+
+    printer = ETS数据提取器._解析器实例()
+    params = {'q': query}
+    if query.startswith('/rank'):
+        params = {'q': query[len('/rank'):].strip(), 'rank': '1'}
+    try:
+        with urlopen(f"http://{host}:{port}/search?{urlencode(params)}", timeout=10) as resp:
+            data = json.loads(resp.read().decode('utf-8'))
+    except HTTPError as e:
+        # 守护进程返回了错误（比如查询语法错误）
+        try:
+            message = json.loads(e.read().decode('utf-8')).get('error', e.reason)
+        except ValueError:
+            message = e.reason
+        print(f"{printer.RED}❌ {message}{printer.NC}")
+        return 1
+    except URLError as e:
+        print(f"{printer.RED}❌ 连接守护进程失败（{host}:{port}）: {e.reason}，"
+              f"请先用 --daemon 启动{printer.NC}")
+        return 1
+    # 和命令行模式一样整体渲染后一次写出，普通搜索高亮命中的内容
+    patterns = 高亮模式(query) if 'rank' not in params else []
+    out = []
+    for n, row in enumerate(data['results'], 1):
+        item = dict(row['fields'], type=row['type'], sources=row.get('sources', []))
+        if 'score' in row:
+            out.append(f"{printer.PURPLE}#{n}  相关度 {row['score']:.2f}{printer.NC}")
+        printer._print_item(item, out, printer._highlighter(item, patterns))
+    if not data['results']:
+        out.append(f"{printer.RED}❌ 未找到包含 \"{data['query']}\" 的题目。{printer.NC}")
+    elif data['total'] > len(data['results']):
+        out.append(f"{printer.YELLOW}⚠️  共 {data['total']} 条结果，只显示前 {len(data['results'])} 条{printer.NC}")
+    printer._write(out)
+    return 0
+
 def 获取默认路径():
     # 获取Windows默认ETS路径
     try:
@@ -754,6 +3580,45 @@ def 获取默认路径():
     except Exception:
         return os.path.expanduser("~")
 
+def 拆分题库目录(text):
+    # 多个题库目录用 os.pathsep（Windows 是 ";"，其它系统是 ":"）分隔
+    return [part.strip().strip('"') for part in text.split(os.pathsep) if part.strip()]
+
+def 弹出参数值(flag, default=None):
+    # 从 sys.argv 取出 "--flag 值" 或 "--flag=值"，并把它们移除
+    for i, arg in enumerate(sys.argv):
+        if arg == flag and i + 1 < len(sys.argv):
+            value = sys.argv[i + 1]
+            del sys.argv[i:i + 2]
+            return value
+        if arg.startswith(flag + '='):
+            del sys.argv[i]
+            return arg[len(flag) + 1:]
+    return default
+
+class 线程输出缓冲:
+    # 临时替换 sys.stdout：指定线程写的内容先存起来，其它线程照常输出
+    def __init__(self, thread, target):
+        self.thread = thread
+        self.target = target
+        self.parts = []
+
+    def write(self, text):
+        if threading.current_thread() is self.thread:
+            self.parts.append(text)
+            return len(text)
+        return self.target.write(text)
+
+    def flush(self):
+        if threading.current_thread() is not self.thread:
+            self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
 # 主程序
 if __name__ == "__main__":
     # 检测是否强制使用控制台模式，同时支持 -console 和 --console
@@ -762,21 +3627,198 @@ if __name__ == "__main__":
         # 移除所有控制台相关的参数
         sys.argv = [arg for arg in sys.argv if arg not in ['-console', '--console']]
         print("🔄 使用控制台模式运行")
+
+    # --no-cache 跳过解析缓存，每次都完整解析
+    use_cache = '--no-cache' not in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--no-cache']
+
+    # --jobs N 并行解析，0 表示按 CPU 核数
+    try:
+        jobs = int(弹出参数值('--jobs', '1'))
+    except ValueError:
+        print("⚠️  --jobs 需要一个整数，使用默认值 1")
+        jobs = 1
+
+    # --stats 统计各阶段耗时和查询延迟，退出时打印
+    show_stats = '--stats' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--stats']
+
+    # --profile 或 --profile=文件 用 cProfile 记录整个运行过程
+    profile_file = None
+    for arg in list(sys.argv):
+        if arg == '--profile' or arg.startswith('--profile='):
+            sys.argv.remove(arg)
+            profile_file = arg.split('=', 1)[1] if '=' in arg else 'fuckets.prof'
+    if profile_file:
+        import atexit
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+
+        def 保存性能分析():
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            print(f"\n📈 性能分析已保存到 {profile_file}，耗时最多的函数：")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+
+        atexit.register(保存性能分析)
+        profiler.enable()
+
+    # --watch 或 --watch=秒 开启监视模式，题库有变化时自动增量更新
+    watch_interval = None
+    for arg in list(sys.argv):
+        if arg == '--watch' or arg.startswith('--watch='):
+            sys.argv.remove(arg)
+            try:
+                watch_interval = float(arg.split('=', 1)[1]) if '=' in arg else WATCH_INTERVAL
+            except ValueError:
+                print(f"⚠️  --watch 的间隔需要是数字，使用默认值 {WATCH_INTERVAL:g} 秒")
+                watch_interval = WATCH_INTERVAL
     
+    # --batch 文件 批量查询，每行一个关键词，结果以 JSON Lines 输出到 stdout；"-" 表示从 stdin 读
+    batch_file = 弹出参数值('--batch')
+    # --root 目录 直接指定题库目录，不再询问；可以重复，或用 os.pathsep 分隔多个目录
+    root_args = []
+    value = 弹出参数值('--root')
+    while value is not None:
+        root_args.extend(拆分题库目录(value))
+        value = 弹出参数值('--root')
+    root_arg = os.pathsep.join(root_args)
+    # --daemon 常驻内存提供查询，--client 关键词 把查询发给守护进程，--port 指定端口
+    daemon_mode = '--daemon' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--daemon']
+    client_query = 弹出参数值('--client')
+    try:
+        daemon_port = int(弹出参数值('--port', str(DAEMON_PORT)))
+    except ValueError:
+        print(f"⚠️  --port 需要一个整数，使用默认值 {DAEMON_PORT}")
+        daemon_port = DAEMON_PORT
+    if client_query is not None:
+        sys.exit(守护进程查询(client_query, daemon_port))
+    # --export-index 文件 解析题库后导出二进制索引；--index 文件 直接用 mmap 打开导出的索引，不再扫描题库
+    export_file = 弹出参数值('--export-index')
+    index_file = 弹出参数值('--index')
+    # --export-sqlite 文件 把题库写进 SQLite（已有的文件增量更新）；--backend sqlite 普通搜索改走 FTS5
+    export_sqlite_file = 弹出参数值('--export-sqlite')
+    backend = 弹出参数值('--backend', 'memory')
+    if backend not in ('memory', 'sqlite'):
+        print(f"⚠️  未知的搜索后端 {backend}，可用: memory、sqlite，使用 memory")
+        backend = 'memory'
+    # --verify-assets 批量检查缓存里记录的音频、图片是否还在、大小有没有变化
+    verify_assets = '--verify-assets' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--verify-assets']
+
     # 判断是否在 Windows 系统上运行
     is_windows = platform.system() == 'Windows'
     
     BUILTIN_PATH = "/storage/emulated/0/Android/data/com.ets100.secondary/files/Download/ETS_secondary/resource/"
     root_dir = ""
+
+    def 创建提取器(root_dir):
+        if index_file:
+            if backend == 'sqlite':
+                print("⚠️  二进制索引不能使用 SQLite 后端，使用 memory")
+            return ETS数据提取器.打开索引(index_file, stats=show_stats)
+        roots = 拆分题库目录(root_dir)
+        if len(roots) > 1:
+            extractor = 多题库提取器(roots, use_cache=use_cache, jobs=jobs, stats=show_stats)
+        else:
+            extractor = ETS数据提取器(root_dir, use_cache=use_cache, jobs=jobs, stats=show_stats)
+        if backend == 'sqlite':
+            extractor.use_sqlite()
+        return extractor
+
+    if verify_assets:
+        try:
+            extractor = 创建提取器(root_arg or BUILTIN_PATH)
+            with extractor.stats.phase('verify_assets'):
+                problems = extractor.verify_assets()
+        except Exception as e:
+            print(f"❌ 检查素材失败: {e}")
+            sys.exit(1)
+        for key, name, problem in problems[:VERIFY_ASSETS_SHOWN]:
+            print(f"⚠️  {key}: {name} {problem}")
+        if len(problems) > VERIFY_ASSETS_SHOWN:
+            print(f"... 还有 {len(problems) - VERIFY_ASSETS_SHOWN} 个问题未显示")
+        print(f"{'❌' if problems else '✅'} 素材检查完成，发现 {len(problems)} 个问题")
+        if show_stats:
+            extractor.print_stats()
+        sys.exit(1 if problems else 0)
+
+    if export_file:
+        try:
+            extractor = ETS数据提取器(root_arg or BUILTIN_PATH, use_cache=use_cache, jobs=jobs, stats=show_stats)
+            extractor.export_index(export_file)
+        except Exception as e:
+            print(f"❌ 导出索引失败: {e}")
+            sys.exit(1)
+        print(f"✅ 已导出 {len(extractor.index.records) - extractor.index.dead} 条题目的索引到 {export_file}"
+              f"（{os.path.getsize(export_file) / 1024 / 1024:.1f} MB），之后可以用 --index {export_file} 打开")
+        sys.exit(0)
+
+    if export_sqlite_file:
+        try:
+            extractor = ETS数据提取器(root_arg or BUILTIN_PATH, use_cache=use_cache, jobs=jobs, stats=show_stats)
+            updated, removed = extractor.export_sqlite(export_sqlite_file)
+        except Exception as e:
+            print(f"❌ 导出 SQLite 失败: {e}")
+            sys.exit(1)
+        print(f"✅ 已导出 {len(extractor.all_data)} 条题目到 {export_sqlite_file}"
+              f"（更新 {updated} 个源文件，移除 {removed} 个）")
+        if show_stats:
+            extractor.print_stats()
+        sys.exit(0)
     
+    if batch_file is not None:
+        # 批量模式：stdout 只输出 JSON，提示信息都写到 stderr
+        root_dir = root_arg or BUILTIN_PATH
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                extractor = 创建提取器(root_dir)
+            if batch_file == '-':
+                queries, hits = extractor.batch_mode(sys.stdin)
+            else:
+                with open(batch_file, encoding='utf-8') as f:
+                    queries, hits = extractor.batch_mode(f)
+            print(f"✅ 批量查询完成：{queries} 个查询，{hits} 条结果", file=sys.stderr)
+            if show_stats:
+                with contextlib.redirect_stdout(sys.stderr):
+                    extractor.print_stats()
+        except BrokenPipeError:
+            # 下游（比如 head）提前关闭了管道
+            sys.stderr.close()
+            sys.exit(0)
+        except Exception as e:
+            print(f"❌ 批量查询失败: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    if daemon_mode:
+        # 守护进程：加载一次后常驻，默认开启监视模式，题库有变化时在后台增量更新
+        try:
+            extractor = 创建提取器(root_arg or BUILTIN_PATH)
+            if not extractor.index_file:
+                extractor.start_watch(watch_interval or WATCH_INTERVAL)
+            运行守护进程(extractor, daemon_port)
+        except Exception as e:
+            print(f"❌ 守护进程启动失败: {e}")
+            sys.exit(1)
+        if show_stats:
+            extractor.print_stats()
+        sys.exit(0)
+
     print("ETS 听说考试搜题工具")
     
     # 如果是 Windows 系统，弹出文件选择窗口
-    if is_windows and tk_fd is not None:
+    if index_file:
+        print(f"📦 使用二进制索引 {index_file}")
+    elif root_arg:
+        root_dir = root_arg
+    elif is_windows:
         try:
             print("正在打开文件选择窗口...")
             default_path = 获取默认路径()
-            root_dir = tk_fd.askdirectory(title="选择 ETS 题库目录", initialdir=default_path)
+            root_dir = 选择目录(default_path)
             if not root_dir:
                 # 用户取消选择
                 print("用户取消了选择，将使用命令行输入方式。")
@@ -794,49 +3836,91 @@ if __name__ == "__main__":
                 root_dir = BUILTIN_PATH
     else:
         # 非 Windows 系统或tk_filedialog不可用，使用原有的命令行输入方式
-        print("请输入试卷所在目录路径，直接回车使用默认路径（推荐）：")
+        print(f"请输入试卷所在目录路径，多个目录用 {os.pathsep} 分隔，直接回车使用默认路径（推荐）：")
         print(f"默认路径: {BUILTIN_PATH}")
         root_dir = input("目录路径: ").strip().strip('"')
         # 如果用户直接回车，使用内置路径
         if not root_dir:
             root_dir = BUILTIN_PATH
 
+    # Windows 上有 PyQt5 且没指定 --console 时要先问运行模式
+    ask_mode = is_windows and PYQT_AVAILABLE and not use_console
+
+    def 加载题库():
+        extractor = 创建提取器(root_dir)
+        if show_stats:
+            extractor.print_stats()
+        if watch_interval is not None:
+            extractor.start_watch(watch_interval)
+        return extractor
+
     try:
-        extractor = ETS数据提取器(root_dir)
-        
-        # 检查是否为 Windows 且 PyQt5 可用
-        if is_windows and PYQT_AVAILABLE and '自定义悬浮窗' in globals():
-            # Windows系统且PyQt5可用，询问用户使用GUI还是控制台
-            if not use_console:
-                while True:
-                    try:
-                        choice = input("请选择运行模式 (y: GUI, n: 控制台): ").strip().lower()
-                        if choice == 'y':
-                            app = QApplication(sys.argv)
-                            # 设置应用样式
-                            app.setStyle('Fusion')
-                            
-                            window = 自定义悬浮窗(extractor)
-                            window.show()
-                            sys.exit(app.exec_())
-                        elif choice == 'n':
-                            break  # 使用控制台模式
-                        else:
-                            print("请输入 y 或 n。")
-                    except KeyboardInterrupt:
-                        print("\n操作已取消。")
+        if ask_mode:
+            # 用户看模式提示的时候，题库已经在后台解析
+            loaded = {}
+
+            def 后台加载():
+                try:
+                    loaded['extractor'] = 加载题库()
+                except BaseException as e:
+                    loaded['error'] = e
+
+            loader = threading.Thread(target=后台加载, name='ETS-ingest', daemon=True)
+            # 解析进度等输出先存起来，等模式选完再打印，不和输入提示混在一起
+            loader_output = 线程输出缓冲(loader, sys.stdout)
+            sys.stdout = loader_output
+            loader.start()
+            choice = None
+            while True:
+                try:
+                    choice = input("请选择运行模式 (y: GUI, n: 控制台): ").strip().lower()
+                    if choice in ('y', 'n'):
                         break
-            # 使用控制台模式
-            extractor.interactive_mode()
+                    print("请输入 y 或 n。")
+                except KeyboardInterrupt:
+                    print("\n操作已取消。")
+                    break
+            try:
+                loader.join()
+            except KeyboardInterrupt:
+                sys.stdout = loader_output.target
+                print("\n操作已取消。")
+                sys.exit(1)
+            sys.stdout = loader_output.target
+            sys.stdout.write(loader_output.getvalue())
+            sys.stdout.flush()
+            if 'error' in loaded:
+                raise loaded['error']
+            extractor = loaded['extractor']
+
+            if choice == 'y':
+                try:
+                    QApplication, 自定义悬浮窗 = 加载GUI()
+                except ImportError as e:
+                    print(f"PyQt5 导入失败（{e}），使用控制台模式")
+                else:
+                    app = QApplication(sys.argv)
+                    # 设置应用样式
+                    app.setStyle('Fusion')
+
+                    window = 自定义悬浮窗(extractor)
+                    window.show()
+                    exit_code = app.exec_()
+                    if show_stats:
+                        extractor.print_stats()
+                    sys.exit(exit_code)
         else:
+            extractor = 加载题库()
             # 非Windows系统或PyQt5不可用，直接使用控制台模式
             if not is_windows:
                 print("非 Windows 系统，使用控制台模式")
             elif not PYQT_AVAILABLE:
                 print("PyQt5 未安装，使用控制台模式（可通过 pip install PyQt5 安装）")
-            elif '自定义悬浮窗' not in globals():
-                print("GUI 窗口类未定义，使用控制台模式")
-            extractor.interactive_mode()
+
+        # 使用控制台模式
+        extractor.interactive_mode()
+        if show_stats:
+            extractor.print_stats()
             
     except Exception as e:
         print(f"❌ 启动失败: {e}")
@@ -0,0 +1,682 @@
+# FuckETS 性能测试
+# 用法:
+#   python benchmark.py clean_html [题库目录]
+#       对比新旧 _clean_html，不给目录时用内置样例，给目录时从 content.json 收集真实字段
+#   python benchmark.py suite [--size N] [--out 结果.json] [--keep 目录]
+#       生成模拟题库，测试冷/热启动解析、HTML 清理、搜索延迟和 GUI 渲染，结果输出为 JSON
+#   python benchmark.py generate 目录 [--size N]
+#       只生成模拟题库
+#   python benchmark.py importtime [--budget-ms N]
+#       用 python -X importtime 测控制台模式的导入耗时，超出预算或导入了界面库时返回 1
+#   python benchmark.py querycheck [--size N]
+#       对比查询语言走索引候选和逐条扫描的结果（重点是带 {m,n} 量词和字符类的正则），不一致时返回 1
+#   python benchmark.py refreshcheck [--size N]
+#       在有重复题目的模拟题库上做增量更新，和重新完整解析的结果比较，再用缓存和启动索引重启后比较，不一致时返回 1
+#   python benchmark.py indexcheck [--size N]
+#       导出二进制索引后用 mmap 打开，搜索、查询语言、排序搜索和相似题的结果和内存里的实例比较，不一致时返回 1
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+import FuckETS
+from FuckETS import ETS数据提取器
+
+# 仿照 ETS 题库的典型字段
+SAMPLE_FIELDS = [
+    "<p>Good morning,&nbsp;everyone.&nbsp;Today I&#39;d like to talk about&nbsp;<strong>the school trip</strong>.</p><p><br/></p>"
+    "<p>We will visit the science museum on Friday&nbsp;&amp;&nbsp;come back before 5 p.m.</p>",
+    "<p style=\"text-indent:2em\">ets_th1 What does the man want to do? ets_th2</p>",
+    "<span>W: Excuse me, where is the nearest library?</span><br><span>M: Go straight and turn left at the second crossing.</span>",
+    "本题考查&nbsp;<b>一般将来时</b>，注意&quot;will&quot;的用法。<br/>参考答案：&lt;略&gt;",
+    "He went to the cinema with his friends last weekend.",
+    "<div><p>Some people think that&nbsp;students should wear uniforms&#8230;</p>\n\n<p>  Others disagree.  </p></div>",
+]
+
+# 各题型里会经过 _clean_html 的字段
+HTML_KEYS = ('value', 'analyze', 'st_nr', 'ask', 'xt_nr', 'xt_analy', 'keypoint', 'topic')
+
+# 移动版的六种题型
+STRUCTURE_TYPES = ('collector.dialogue', 'collector.role', 'collector.read',
+                   'collector.choose', 'collector.fill', 'collector.picture')
+
+
+def 旧版清理(text):
+    # 改写前的 _clean_html，用来对比
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r'<[^>]+>', '', text)
+    replacements = {
+        '&nbsp;': ' ',
+        '&amp;': '&',
+        '&quot;': '"',
+        '<': '<',
+        '>': '>',
+    }
+    for k, v in replacements.items():
+        text = text.replace(k, v)
+    text = re.sub(r'</?br\s*/?>', '\n', text, flags=re.IGNORECASE)
+    text = re.sub(r'ets_th\d+', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+# --------------------------模拟题库
+
+class 语料生成器:
+    # 生成仿 ETS 结构的模拟题库，词表由随机音节拼成，保证搜索有不同的选择度
+    SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'ha', 'je', 'ki', 'lo', 'mu', 'na', 'pe',
+                 'qi', 'ro', 'su', 'ta', 've', 'wi', 'xo', 'yu', 'ze', 'th', 'sh', 'ch']
+
+    def __init__(self, seed=2024, vocab_size=3000):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocab_size:
+            words.add(''.join(self.rng.choice(self.SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        self.words = sorted(words)
+        # 让词频近似 Zipf 分布
+        self.weights = [1.0 / (i + 1) for i in range(len(self.words))]
+
+    def sentence(self, n):
+        words = self.rng.choices(self.words, weights=self.weights, k=n)
+        return ' '.join(words).capitalize() + '.'
+
+    def html(self, n):
+        # 带标签、实体和换行的段落
+        parts = [f"<p>{self.sentence(self.rng.randint(6, 12))}&nbsp;{self.sentence(4)}</p>"
+                 for _ in range(max(1, n // 10))]
+        return '<br/>'.join(parts)
+
+    def info(self, stype, n):
+        rng = self.rng
+        if stype in ('collector.dialogue', 'collector.role'):
+            return {'question': [{
+                'xh': str(i + 1),
+                'ask': f"<p>{self.sentence(8)} (A) {self.sentence(3)} (B) {self.sentence(3)}</p>",
+                'askaudio': f"ques{i + 1}askaudio.mp3",
+                'std': [{'value': self.sentence(rng.randint(3, 8))} for _ in range(rng.randint(1, 3))],
+                'keywords': ' '.join(rng.sample(self.words, 3)),
+            } for i in range(rng.randint(2, 5))]}
+        if stype == 'collector.read':
+            return {'stid': f"r{n}", 'value': self.html(60), 'analyze': f"朗读要点：{self.sentence(6)}",
+                    'audio': 'content.mp3'}
+        if stype == 'collector.choose':
+            return {'st_nr': self.html(40), 'audio': 'content.mp3', 'xtlist': [{
+                'xt_xh': str(i + 1),
+                'xt_nr': f"ets_th{i + 1} {self.sentence(7)}?",
+                'xxlist': [{'xx_mc': c, 'xx_nr': self.sentence(3)} for c in 'ABC'],
+                'answer': rng.choice('ABC'),
+                'xt_analy': f"本题考查&nbsp;{self.sentence(5)}",
+            } for i in range(rng.randint(1, 3))]}
+        if stype == 'collector.fill':
+            return {'stid': f"f{n}", 'value': self.html(50), 'keypoint': self.sentence(5),
+                    'std': [{'th': str(i + 1), 'value': rng.choice(self.words)} for i in range(rng.randint(3, 6))],
+                    'audio': 'content.mp3'}
+        return {'stid': f"p{n}", 'value': self.html(40), 'topic': self.sentence(3),
+                'keypoint': self.sentence(8), 'analyze': self.sentence(6),
+                'image': 'picture.jpg', 'audio': 'content.mp3'}
+
+    def generate(self, root, size):
+        # size 个移动版 content.json，外加 size/10 个电脑版题库目录
+        root = Path(root)
+        for n in range(size):
+            stype = STRUCTURE_TYPES[n % len(STRUCTURE_TYPES)]
+            item_dir = root / "mobile" / f"paper{n // 20:04d}" / f"item{n:05d}"
+            material = item_dir / "material"
+            material.mkdir(parents=True, exist_ok=True)
+            info = self.info(stype, n)
+            for name in ('content.mp3', 'picture.jpg', *(f"ques{i}askaudio.mp3" for i in range(1, 6))):
+                (material / name).write_bytes(b'\0')
+            with open(item_dir / "content.json", 'w', encoding='utf-8') as f:
+                json.dump({'structure_type': stype, 'info': info}, f, ensure_ascii=False)
+        for n in range(max(1, size // 10)):
+            tpl = root / "pc" / f"template{n:04d}"
+            material = tpl / "material"
+            material.mkdir(parents=True, exist_ok=True)
+            for name in ('content.mp3', 'ques1askaudio.mp3', 'ques2askaudio.mp3', 'ques3askaudio.mp3'):
+                (material / name).write_bytes(b'\0')
+            (tpl / "ctrl.json").write_text('{}', encoding='utf-8')
+            with open(tpl / "info.json", 'w', encoding='utf-8') as f:
+                json.dump([{'code_id': 'paper_name', 'code_value': f"模拟试卷 {n}"}], f, ensure_ascii=False)
+            with open(tpl / "res.json", 'w', encoding='utf-8') as f:
+                json.dump({'exam_type_list': [
+                    {'exam_type_name': '模仿朗读', 'exam_type_collect': 'collector.read',
+                     'exam_list': [{'exam_id': f"pc{n}_1"}]},
+                    {'exam_type_name': '回答问题', 'exam_type_collect': 'collector.dialogue',
+                     'exam_list': [{'exam_id': f"pc{n}_2"}]},
+                    {'exam_type_name': '信息转述', 'exam_type_collect': 'collector.picture',
+                     'exam_list': [{'exam_id': f"pc{n}_3"}]},
+                ]}, f, ensure_ascii=False)
+        return root
+
+    def queries(self, count):
+        # 常见词、少见词、词片段和多词短语混合
+        rng = self.rng
+        queries = []
+        for i in range(count):
+            kind = i % 4
+            if kind == 0:
+                queries.append(rng.choice(self.words[:50]))
+            elif kind == 1:
+                queries.append(rng.choice(self.words[500:]))
+            elif kind == 2:
+                word = rng.choice(self.words)
+                queries.append(word[:max(2, len(word) - 2)])
+            else:
+                queries.append(' '.join(rng.sample(self.words[:300], 2)))
+        return queries
+
+
+# --------------------------测试项
+
+def 收集字段(root_dir):
+    # 从题库里收集真实字段
+    fields = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for k, v in node.items():
+                if k in HTML_KEYS and isinstance(v, str) and v:
+                    fields.append(v)
+                else:
+                    walk(v)
+        elif isinstance(node, list):
+            for v in node:
+                walk(v)
+
+    for path in Path(root_dir).rglob("content.json"):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                walk(json.load(f))
+        except Exception:
+            continue
+    return fields
+
+
+def bench_clean_html(fields, repeat=5):
+    # 返回新旧两版的吞吐量
+    extractor = ETS数据提取器._解析器实例()
+    new_clean = extractor._clean_html
+    total_chars = sum(len(f) for f in fields)
+    number = max(1, 200000 // max(1, total_chars))
+
+    def run(func):
+        best = min(timeit.repeat(lambda: [func(f) for f in fields], number=number, repeat=repeat))
+        return best / number
+
+    old_time = run(旧版清理)
+    new_time = run(new_clean)
+    return {
+        'fields': len(fields),
+        'chars': total_chars,
+        'old_seconds': old_time,
+        'new_seconds': new_time,
+        'old_mb_per_s': total_chars / old_time / 1e6,
+        'new_mb_per_s': total_chars / new_time / 1e6,
+        'speedup': old_time / new_time,
+    }
+
+
+def 静默(func, *args, **kwargs):
+    # 屏蔽解析过程中的提示输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def bench_ingest(root, jobs=1):
+    # 冷启动：没有缓存和启动索引；热启动：缓存全部命中，索引直接读回
+    root = Path(root).resolve()
+    cache_file = root.parent / f".{root.name}.fucketscache.json"
+    index_file = root.parent / f".{root.name}.fucketsindex"
+    for path in (cache_file, index_file):
+        if path.exists():
+            path.unlink()
+    start = time.perf_counter()
+    extractor = 静默(ETS数据提取器, root, jobs=jobs)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    静默(ETS数据提取器, root, jobs=jobs)
+    warm = time.perf_counter() - start
+    return extractor, {
+        'records': len(extractor.all_data),
+        'jobs': jobs,
+        'cold_seconds': cold,
+        'warm_seconds': warm,
+        'cache_bytes': cache_file.stat().st_size if cache_file.exists() else 0,
+        'index_bytes': index_file.stat().st_size if index_file.exists() else 0,
+    }
+
+
+def 分位数(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    pos = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[pos]
+
+
+def bench_search(extractor, queries):
+    # search_questions_for_gui 的延迟分布（毫秒），每次先清空查询缓存，测的是索引本身
+    latencies = []
+    hits = 0
+    for q in queries:
+        extractor._query_cache.clear()
+        start = time.perf_counter()
+        hits += len(extractor.search_questions_for_gui(q))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'queries': len(queries),
+        'total_hits': hits,
+        'p50_ms': 分位数(latencies, 0.5),
+        'p90_ms': 分位数(latencies, 0.9),
+        'p99_ms': 分位数(latencies, 0.99),
+        'max_ms': max(latencies) if latencies else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+    }
+
+
+def bench_typing(extractor, queries):
+    # 模拟边输入边搜索：每个查询从 1 个字符开始逐字输入，对比有无查询缓存时每次按键的延迟（毫秒）
+    result = {}
+    for label, keep in (('cold', False), ('cached', True)):
+        latencies = []
+        extractor._query_cache.clear()
+        for q in queries:
+            for n in range(1, len(q) + 1):
+                if not keep:
+                    extractor._query_cache.clear()
+                start = time.perf_counter()
+                extractor.search_questions_for_gui(q[:n])
+                latencies.append((time.perf_counter() - start) * 1000)
+        result[label] = {
+            'keystrokes': len(latencies),
+            'p50_ms': 分位数(latencies, 0.5),
+            'p90_ms': 分位数(latencies, 0.9),
+            'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+        }
+    extractor._query_cache.clear()
+    return result
+
+
+def bench_render(extractor, limit=2000):
+    # format_item_for_gui：首次渲染和命中缓存后的耗时
+    items = extractor.all_data[:limit]
+    extractor._html_cache.clear()
+    start = time.perf_counter()
+    total = sum(len(extractor.format_item_for_gui(item)) for item in items)
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    for item in items:
+        extractor.format_item_for_gui(item)
+    cached = time.perf_counter() - start
+    return {
+        'items': len(items),
+        'html_chars': total,
+        'first_us_per_item': first / max(1, len(items)) * 1e6,
+        'cached_us_per_item': cached / max(1, len(items)) * 1e6,
+    }
+
+
+# 控制台模式 import FuckETS 的耗时预算（毫秒，取多次运行的最小值）
+IMPORT_BUDGET_MS = 80
+# 控制台模式不应该导入的界面库
+GUI_MODULES = ('tkinter', 'PyQt5')
+_IMPORTTIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def 检查用正则(words):
+    # 从语料单词构造正则：词中间放 {m,n} 量词（最少次数有 0 也有非 0），
+    # 或者放含 ]、\] 和 [^ 的字符类，这些都容易让取字面量出错
+    patterns = ['/bac{1,2}e/', '/bab{1}a/', '/ab{0,3}c/', '/o{2,}k/', '/ee{,2}d/',
+                r'/[\]x]ab/', r'/[\]x]ab[cd]/', '/[^]]ab/', '/[]a]bc/', r'/[^\]]ee/']
+    for w in words:
+        if len(w) < 4:
+            continue
+        for quant in ('{1,2}', '{0,1}', '{2}', '{,2}', '{1,}'):
+            patterns.append(f'/{w[:2]}{quant}{w[2:]}/')
+        patterns += [f'/[{w[0]}\\]]{w[1:]}/', f'/[]{w[0]}]{w[1:]}/', f'/[^]]{w[1:]}/',
+                     f'/{w[:2]}[\\]{w[2]}]{w[3:]}/', f'/[^]{w[0]}]{w[1:]}/']
+    return patterns
+
+
+def check_query_plans(extractor, patterns):
+    # 查询语言的结果和不用索引候选、逐条检查得到的结果比较，返回不一致的 [(查询, 走索引条数, 逐条扫描条数)]
+    index = extractor.index
+    ctx = FuckETS._查询上下文(index, extractor._search_fields)
+    mismatches = []
+    for text in patterns:
+        plan = FuckETS.解析查询(text)
+        expected = [rid for rid in range(len(index.records)) if index._live(rid) and plan.matches(ctx, rid)]
+        extractor._query_cache.clear()
+        got = [id(item) for item in extractor._query(text)]
+        if got != [id(index.records[rid]) for rid in expected]:
+            mismatches.append((text, len(got), len(expected)))
+    extractor._query_cache.clear()
+    return mismatches
+
+
+def 题目内容(item):
+    # 不含随主来源变化的目录、音频、图片
+    fields = {k: v for k, v in item.to_dict().items() if k not in ('directory', 'audio', 'image')}
+    return json.dumps(fields, ensure_ascii=False, sort_keys=True)
+
+
+def 题库状态(extractor):
+    # 去重后的每条题目和它的全部来源，排好序便于比较
+    return sorted((题目内容(item), tuple(sorted(item.sources))) for item in extractor.all_data)
+
+
+def 改题(paper, text):
+    # 原地改试卷里第一道有正文的移动版题目，修改时间往后调，保证增量更新能发现
+    for content in sorted(paper.glob("*/content.json")):
+        data = json.loads(content.read_text(encoding='utf-8'))
+        if 'value' in data['info']:
+            break
+    data['info']['value'] += f'<p>{text}</p>'
+    content.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    stat = content.stat()
+    os.utime(content, (stat.st_atime, stat.st_mtime + 10))
+
+
+def 改动题库(root):
+    # 删掉一份原卷（副本成为主来源）和一份副本，改一道题，新增一份副本，电脑版删一个、复制一个
+    mobile, pc = root / "mobile", root / "pc"
+    shutil.rmtree(mobile / "paper0000")
+    shutil.rmtree(mobile / "paper0001copy")
+    改题(mobile / "paper0002", 'Refresh check sentence.')
+    shutil.copytree(mobile / "paper0003", mobile / "paper0003copy")
+    shutil.rmtree(pc / "template0001")
+    shutil.copytree(pc / "template0002", pc / "template0002copy")
+
+
+def 原地改动(root):
+    # 只改文件内容，源文件列表和顺序都不变
+    改题(root / "mobile" / "paper0004", 'In place.')
+
+
+def 对比完整解析(extractor, root, queries, label):
+    # 增量更新后的实例和重新完整解析的结果比较（不管顺序），返回 (完整解析的实例, 问题列表)
+    fresh = 静默(ETS数据提取器, str(root), use_cache=False)
+    problems = []
+    if 题库状态(extractor) != 题库状态(fresh):
+        problems.append(f"{label}：题目或来源不一致，增量 {len(extractor.all_data)} 条，完整解析 {len(fresh.all_data)} 条")
+    if len(extractor._by_fingerprint) != len(extractor.all_data):
+        problems.append(f"{label}：指纹表 {len(extractor._by_fingerprint)} 项，题目 {len(extractor.all_data)} 条")
+    for q in queries:
+        got = sorted(map(题目内容, extractor._match(q)))
+        expected = sorted(map(题目内容, fresh._match(q)))
+        if got != expected:
+            problems.append(f"{label}：搜索 {q!r} 增量 {len(got)} 条，完整解析 {len(expected)} 条")
+    return fresh, problems
+
+
+def 对比重启(root, fresh, queries, label):
+    # 用更新后的缓存重启两次：第一次重建启动索引，第二次直接读回，题目和搜索结果要和完整解析完全一样
+    problems = []
+    for n, rebuilt in ((1, True), (2, False)):
+        restarted = 静默(ETS数据提取器, str(root), stats=True)
+        if ('index' in restarted.stats.timers) != rebuilt:
+            problems.append(f"{label}第 {n} 次重启时{'没有重建' if rebuilt else '没有读回'}启动索引")
+        if [item.to_dict() for item in restarted.all_data] != [item.to_dict() for item in fresh.all_data]:
+            problems.append(f"{label}第 {n} 次重启后的题目和完整解析不一致")
+        for q in queries:
+            got = [item.to_dict() for item in restarted._match(q)]
+            expected = [item.to_dict() for item in fresh._match(q)]
+            if got != expected:
+                problems.append(f"{label}第 {n} 次重启后搜索 {q!r}：{len(got)} 条，完整解析 {len(expected)} 条")
+    return problems
+
+
+def check_refresh(root, queries):
+    # 有重复题目的题库增量更新后，和重新完整解析的结果比较，再用更新后的缓存重启比较。
+    # 第二轮只原地改文件，源文件列表不变，题目顺序却和重启后不同，容易读回对不上的启动索引。返回问题列表
+    root = Path(root)
+    mobile = root / "mobile"
+    for name in ("paper0000", "paper0001"):
+        shutil.copytree(mobile / name, mobile / f"{name}copy")
+    problems = []
+    for label, change in (("增删改", 改动题库), ("原地修改", 原地改动)):
+        extractor = 静默(ETS数据提取器, str(root))
+        if not any(item.source_count > 1 for item in extractor.all_data):
+            problems.append(f"{label}：题库里没有重复题目，检查不到去重")
+        change(root)
+        if not any(静默(extractor.refresh)):
+            problems.append(f"{label}：增量更新没有发现改动")
+        fresh, found = 对比完整解析(extractor, root, queries, label)
+        problems += found
+        # 监视模式下空位太多时会按更新后的顺序整体重建，这个顺序和重启后的不同
+        静默(extractor._build_index)
+        problems += 对比重启(root, fresh, queries, label)
+    return problems
+
+
+def check_index(extractor, queries, path):
+    # 导出二进制索引再用 mmap 打开，搜索和排序搜索的结果和内存里的实例比较，返回问题列表
+    extractor.export_index(path)
+    mapped = ETS数据提取器.打开索引(path)
+    problems = []
+    if len(mapped.all_data) != len(extractor.all_data):
+        problems.append(f"记录数不一致：内存 {len(extractor.all_data)} 条，索引 {len(mapped.all_data)} 条")
+    # 相似题：按原文查询时只应解码返回的记录；再拿解码出的记录查询，结果里不含它自己
+    decoded = mapped.all_data._decoded
+    texts = [text for text in map(FuckETS.相似文本, extractor.all_data[::7]) if text][:40]
+    for text in texts:
+        before = len(decoded)
+        got = [(round(score, 9), item.to_dict()) for score, item in mapped.find_similar(text)]
+        expected = [(round(score, 9), item.to_dict()) for score, item in extractor.find_similar(text)]
+        if got != expected:
+            problems.append(f"相似题 {text[:20]!r}…：内存 {len(expected)} 条，索引 {len(got)} 条")
+        if len(decoded) - before > len(got):
+            problems.append(f"相似题查询解码了 {len(decoded) - before} 条记录，只返回 {len(got)} 条")
+    for rid in list(decoded)[:20]:
+        got = [(round(score, 9), item.to_dict()) for score, item in mapped.find_similar(mapped.all_data[rid])]
+        expected = [(round(score, 9), item.to_dict()) for score, item in extractor.find_similar(extractor.all_data[rid])]
+        if got != expected:
+            problems.append(f"第 {rid} 条记录的相似题不一致")
+    for q in queries:
+        got = [item.to_dict() for item in mapped._match(q)]
+        expected = [item.to_dict() for item in extractor._match(q)]
+        if got != expected:
+            problems.append(f"搜索 {q!r}：内存 {len(expected)} 条，索引 {len(got)} 条")
+        got = [(round(score, 9), item.to_dict()) for score, item in mapped.ranked_search(q)]
+        expected = [(round(score, 9), item.to_dict()) for score, item in extractor.ranked_search(q)]
+        if got != expected:
+            problems.append(f"排序搜索 {q!r} 的结果不一致")
+    return problems
+
+
+def bench_import(repeat=5, top=8):
+    # 每次都起一个新解释器跑 python -X importtime -c "import FuckETS"，解析 stderr
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import FuckETS'],
+                              capture_output=True, text=True, cwd=Path(__file__).resolve().parent)
+        modules = {}
+        for line in proc.stderr.splitlines():
+            m = _IMPORTTIME_LINE.match(line)
+            if m:
+                # 缩进表示嵌套层级，只保留第一次出现（顶层）的记录
+                modules.setdefault(m.group(4), (int(m.group(1)), int(m.group(2)), len(m.group(3))))
+        if 'FuckETS' not in modules:
+            raise RuntimeError(f"import FuckETS 失败: {proc.stderr.strip()[-500:]}")
+        if best is None or modules['FuckETS'][1] < best['FuckETS'][1]:
+            best = modules
+    own_depth = best['FuckETS'][2]
+    # FuckETS 直接导入的模块（比它多一层缩进）
+    direct = [(name, cumulative) for name, (_, cumulative, depth) in best.items()
+              if depth == own_depth + 2]
+    direct.sort(key=lambda item: -item[1])
+    return {
+        'cumulative_ms': best['FuckETS'][1] / 1000,
+        'self_ms': best['FuckETS'][0] / 1000,
+        'gui_modules': sorted(name for name in best if name.split('.')[0] in GUI_MODULES),
+        'heaviest': [{'module': name, 'ms': us / 1000} for name, us in direct[:top]],
+    }
+
+
+def 代码版本():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(size, jobs=1, queries=200, keep=None, seed=2024):
+    generator = 语料生成器(seed=seed)
+    workdir = Path(keep) if keep else Path(tempfile.mkdtemp(prefix="fuckets-bench-"))
+    root = workdir / "resource"
+    try:
+        if not root.exists():
+            start = time.perf_counter()
+            generator.generate(root, size)
+            generate_seconds = time.perf_counter() - start
+        else:
+            generate_seconds = 0.0
+        extractor, ingest = bench_ingest(root, jobs=jobs)
+        return {
+            'benchmark': 'fuckets-suite',
+            'commit': 代码版本(),
+            'cache_version': FuckETS.CACHE_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'corpus': {'size': size, 'seed': seed, 'generate_seconds': generate_seconds},
+            'ingest': ingest,
+            'clean_html': bench_clean_html(收集字段(root), repeat=3),
+            'search': bench_search(extractor, generator.queries(queries)),
+            'typing': bench_typing(extractor, generator.queries(max(1, queries // 4))),
+            'render': bench_render(extractor),
+            'import': bench_import(),
+        }
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="FuckETS 性能测试")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_clean = sub.add_parser('clean_html', help="对比新旧 _clean_html")
+    p_clean.add_argument('root', nargs='?', help="从这个题库目录收集字段")
+    p_suite = sub.add_parser('suite', help="完整测试，输出 JSON")
+    p_suite.add_argument('--size', type=int, default=2000, help="移动版题目文件数")
+    p_suite.add_argument('--jobs', type=int, default=1, help="解析并行数")
+    p_suite.add_argument('--queries', type=int, default=200, help="搜索测试的查询数")
+    p_suite.add_argument('--seed', type=int, default=2024)
+    p_suite.add_argument('--out', help="结果写入文件，默认输出到屏幕")
+    p_suite.add_argument('--keep', help="模拟题库放在这个目录并保留，已存在时直接复用")
+    p_gen = sub.add_parser('generate', help="只生成模拟题库")
+    p_gen.add_argument('root')
+    p_gen.add_argument('--size', type=int, default=2000)
+    p_gen.add_argument('--seed', type=int, default=2024)
+    p_import = sub.add_parser('importtime', help="测控制台模式的导入耗时")
+    p_import.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS,
+                          help=f"导入耗时预算，默认 {IMPORT_BUDGET_MS} ms")
+    p_import.add_argument('--repeat', type=int, default=5)
+    p_check = sub.add_parser('querycheck', help="对比查询语言走索引和逐条扫描的结果")
+    p_check.add_argument('--size', type=int, default=600)
+    p_check.add_argument('--seed', type=int, default=2024)
+    p_refresh = sub.add_parser('refreshcheck', help="对比增量更新和完整解析的结果")
+    p_refresh.add_argument('--size', type=int, default=400)
+    p_refresh.add_argument('--seed', type=int, default=2024)
+    p_index = sub.add_parser('indexcheck', help="对比 mmap 打开的二进制索引和内存实例的结果")
+    p_index.add_argument('--size', type=int, default=600)
+    p_index.add_argument('--seed', type=int, default=2024)
+    args = parser.parse_args(argv[1:])
+
+    if args.command == 'clean_html':
+        if args.root:
+            fields = 收集字段(args.root)
+            if not fields:
+                print(f"❌ 没有在 {args.root} 找到可用的字段")
+                return 1
+        else:
+            fields = SAMPLE_FIELDS
+        result = bench_clean_html(fields)
+        print(f"字段数: {result['fields']}，总字符数: {result['chars']}")
+        print(f"旧版: {result['old_seconds'] * 1000:.3f} ms/轮，{result['old_mb_per_s']:.2f} MB/s")
+        print(f"新版: {result['new_seconds'] * 1000:.3f} ms/轮，{result['new_mb_per_s']:.2f} MB/s")
+        print(f"加速: {result['speedup']:.2f}x")
+        return 0
+
+    if args.command == 'importtime':
+        result = bench_import(repeat=args.repeat)
+        print(f"import FuckETS: {result['cumulative_ms']:.1f} ms（自身 {result['self_ms']:.1f} ms），"
+              f"预算 {args.budget_ms:g} ms")
+        for item in result['heaviest']:
+            print(f"  {item['module']:<20} {item['ms']:8.1f} ms")
+        failed = False
+        if result['gui_modules']:
+            print(f"❌ 控制台模式导入了界面库: {', '.join(result['gui_modules'])}")
+            failed = True
+        if result['cumulative_ms'] > args.budget_ms:
+            print("❌ 超出导入耗时预算")
+            failed = True
+        return 1 if failed else 0
+
+    if args.command == 'querycheck':
+        generator = 语料生成器(seed=args.seed)
+        with tempfile.TemporaryDirectory(prefix="fuckets-check-") as workdir:
+            root = Path(workdir) / "resource"
+            generator.generate(root, args.size)
+            with contextlib.redirect_stdout(io.StringIO()):
+                extractor = ETS数据提取器(str(root), use_cache=False)
+            patterns = 检查用正则(generator.words[:40])
+            mismatches = check_query_plans(extractor, patterns)
+        print(f"检查了 {len(patterns)} 个查询，{len(mismatches)} 个不一致")
+        for text, got, expected in mismatches:
+            print(f"❌ {text}: 走索引 {got} 条，逐条扫描 {expected} 条")
+        return 1 if mismatches else 0
+
+    if args.command == 'refreshcheck':
+        generator = 语料生成器(seed=args.seed)
+        with tempfile.TemporaryDirectory(prefix="fuckets-check-") as workdir:
+            root = generator.generate(Path(workdir) / "resource", args.size)
+            problems = check_refresh(root, generator.queries(40) + ['模仿朗读', '回答问题', 'refresh check'])
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{'❌' if problems else '✅'} 增量更新检查完成，发现 {len(problems)} 个问题")
+        return 1 if problems else 0
+
+    if args.command == 'indexcheck':
+        generator = 语料生成器(seed=args.seed)
+        with tempfile.TemporaryDirectory(prefix="fuckets-check-") as workdir:
+            root = generator.generate(Path(workdir) / "resource", args.size)
+            extractor = 静默(ETS数据提取器, str(root), use_cache=False)
+            queries = generator.queries(80) + [FuckETS.QUERY_PREFIX + p for p in 检查用正则(generator.words[:8])]
+            problems = check_index(extractor, queries, Path(workdir) / "resource.fucketsindex")
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{'❌' if problems else '✅'} 检查了 {len(queries)} 个查询，发现 {len(problems)} 个问题")
+        return 1 if problems else 0
+
+    if args.command == 'generate':
+        语料生成器(seed=args.seed).generate(args.root, args.size)
+        print(f"✅ 已生成 {args.size} 个题目文件到 {args.root}")
+        return 0
+
+    result = run_suite(args.size, jobs=args.jobs, queries=args.queries, keep=args.keep, seed=args.seed)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + '\n', encoding='utf-8')
+        print(f"✅ 结果已写入 {args.out}")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))